@@ -2,9 +2,9 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from utils.pdf_extractor import extract_prices_from_pdf
+from utils.pdf_extractor import extract_prices_from_pdf, EXTRACTOR_VERSION
 from utils.data_processor import process_data, filter_data, search_products
-from utils.visualization import create_price_comparison_chart, create_market_comparison_chart, create_price_distribution_chart
+from utils.visualization import create_price_comparison_chart, create_market_comparison_chart, create_price_distribution_chart, create_category_comparison_chart
 import os
 import tempfile
 
@@ -274,15 +274,26 @@ st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Home", "Data Extraction", "Web Scraping", "Price Comparison", "Market Analysis"])
 
 # Import the web scraper and database modules
-from utils.web_scraper import scrape_stokomak_prices, scrape_vero_prices
-from utils.database import setup_database, store_scraped_products, get_products_from_db
-from utils.kam_extractor import extract_kam_prices_from_pdf, kam_pdf_to_csv
+from scrape_daemon import SCRAPE_LOG_PATH, start_scrape
+from utils.database import setup_database, store_scraped_products, query_products, count_products, get_product_filter_options, get_price_stats
+from utils.kam_extractor import extract_kam_prices_from_pdf, KAM_EXTRACTOR_VERSION
+from utils.extraction_cache import cached_extraction
 from utils.sample_data import load_sample_data
 import base64
 import random
 from PIL import Image
 import io
 
+# Products loaded per page of the Home grid when browsing the database
+HOME_PAGE_SIZE = 48
+
+# Products listed per page of the Price Comparison table
+COMPARISON_PAGE_SIZE = 100
+
+# Processes parsing an uploaded KAM PDF. Every upload starts its own pool
+# inside the server process, so keep it small; the ingest CLI uses all cores.
+KAM_EXTRACT_WORKERS = int(os.getenv('KAM_EXTRACT_WORKERS', str(min(4, os.cpu_count() or 1))))
+
 # Function to get default image if none is available
 def get_default_image(category=None):
     # Default placeholder image for products
@@ -351,16 +362,14 @@ if page == "Home":
     st.title("MK Price Comparison")
     st.write("Find the best prices for products across different markets in Macedonia")
     
-    # Check if we have data
-    if st.session_state.data is None or st.session_state.data.empty:
-        # Load from database if available
-        try:
-            db_products = get_products_from_db()
-            if not db_products.empty:
-                st.session_state.data = db_products
-                st.session_state.filtered_data = db_products
-        except Exception as e:
-            st.error(f"Could not load data from database: {e}")
+    # Products stored in the database are filtered and paged by the database,
+    # so only the products shown are loaded
+    use_database = False
+    if st.session_state.data is None or st.session_state.data.empty or st.session_state.get('data_source') == 'database':
+        filter_options = get_product_filter_options()
+        use_database = filter_options['has_products']
+    
+    has_data = use_database or (st.session_state.data is not None and not st.session_state.data.empty)
     
     # Search and filter section
     st.markdown('<div class="section-header">Find Products</div>', unsafe_allow_html=True)
@@ -371,35 +380,53 @@ if page == "Home":
         search_query = st.text_input("Search Products", placeholder="Search by name...")
     
     with col2:
-        if st.session_state.data is not None and not st.session_state.data.empty:
-            categories = st.session_state.data['category'].dropna().unique()
+        if has_data:
+            categories = filter_options['categories'] if use_database else st.session_state.data['category'].dropna().unique()
             selected_category = st.selectbox("Category", ["All Categories"] + list(categories))
         else:
             selected_category = "All Categories"
     
     with col3:
-        if st.session_state.data is not None and not st.session_state.data.empty:
-            markets = st.session_state.data['market'].unique()
+        if has_data:
+            markets = filter_options['markets'] if use_database else st.session_state.data['market'].unique()
             selected_market = st.selectbox("Market", ["All Markets"] + list(markets))
         else:
             selected_market = "All Markets"
     
     # Display products in a grid layout
-    if st.session_state.data is not None and not st.session_state.data.empty:
+    if has_data:
         # Filter data based on selections
-        data = st.session_state.data
-        
-        if search_query:
-            data = search_products(data, search_query)
-        
-        if selected_category != "All Categories":
-            data = data[data['category'] == selected_category]
-        
-        if selected_market != "All Markets":
-            data = data[data['market'] == selected_market]
+        if use_database:
+            filters = {
+                'search': search_query or None,
+                'category': None if selected_category == "All Categories" else selected_category,
+                'markets': None if selected_market == "All Markets" else [selected_market]
+            }
+            # Start again from the first page when the filters or the stored
+            # products change, and count the matching products only then
+            filters_key = {**filters, 'version': filter_options['version']}
+            if st.session_state.get('home_filters') != filters_key:
+                st.session_state.home_filters = filters_key
+                st.session_state.home_limit = HOME_PAGE_SIZE
+                st.session_state.home_count = count_products(**filters)
+            
+            data = query_products(**filters, limit=st.session_state.home_limit)
+            product_count = st.session_state.home_count
+        else:
+            data = st.session_state.data
+            
+            if search_query:
+                data = search_products(data, search_query)
+            
+            if selected_category != "All Categories":
+                data = data[data['category'] == selected_category]
+            
+            if selected_market != "All Markets":
+                data = data[data['market'] == selected_market]
+            
+            product_count = len(data)
         
         # Display product count
-        product_count = len(data)
         st.markdown(f'<div class="section-header">Products <span class="product-count-badge">{product_count}</span></div>', unsafe_allow_html=True)
         
         if product_count == 0:
@@ -424,7 +451,11 @@ if page == "Home":
             st.markdown(grid_html, unsafe_allow_html=True)
             
             # Show a "Load More" button if there are many products
-            if product_count > 20:
+            if use_database:
+                if len(data) < product_count and st.button("Load More Products"):
+                    st.session_state.home_limit += HOME_PAGE_SIZE
+                    st.rerun()
+            elif product_count > 20:
                 st.button("Load More Products")
     else:
         # Empty state
@@ -451,6 +482,7 @@ if page == "Home":
                 with st.spinner("Loading sample product data..."):
                     sample_data = load_sample_data()
                     st.session_state.data = sample_data
+                    st.session_state.data_source = None
                     st.session_state.filtered_data = sample_data
                     st.success("Loaded sample data successfully!")
                     st.rerun()
@@ -484,11 +516,12 @@ if page == "Data Extraction":
                         tmp_path = tmp_file.name
                     
                     # Extract KAM data
-                    kam_data = extract_kam_prices_from_pdf(tmp_path)
+                    kam_data = cached_extraction(tmp_path, extract_kam_prices_from_pdf, KAM_EXTRACTOR_VERSION, workers=KAM_EXTRACT_WORKERS)
                     
                     # Create CSV file
                     csv_path = "data/kam_prices.csv"
-                    kam_pdf_to_csv(tmp_path, csv_path)
+                    if not kam_data.empty:
+                        kam_data.to_csv(csv_path, index=False, encoding='utf-8-sig')
                     
                     # Clean up the temporary file
                     os.unlink(tmp_path)
@@ -505,6 +538,7 @@ if page == "Data Extraction":
                         
                         # Update session state
                         st.session_state.data = kam_data
+                        st.session_state.data_source = None
                         st.session_state.filtered_data = kam_data
                         
                         # Display the extracted data
@@ -551,7 +585,7 @@ if page == "Data Extraction":
                         tmp_path = tmp_file.name
                     
                     # Extract data from the PDF
-                    extracted_data = extract_prices_from_pdf(tmp_path)
+                    extracted_data = cached_extraction(tmp_path, extract_prices_from_pdf, EXTRACTOR_VERSION)
                     
                     # Clean up the temporary file
                     os.unlink(tmp_path)
@@ -567,6 +601,7 @@ if page == "Data Extraction":
             if extracted_data_list:
                 # Process and combine the extracted data
                 st.session_state.data = process_data(extracted_data_list)
+                st.session_state.data_source = None
                 st.session_state.filtered_data = st.session_state.data
                 
                 # Display the extracted data
@@ -598,7 +633,14 @@ elif page == "Price Comparison":
     st.header("Price Comparison")
     st.write("Compare prices for products across different markets")
     
-    if st.session_state.data is None:
+    # Products stored in the database are filtered and paged by the database,
+    # so only the products shown are loaded
+    use_database = False
+    if st.session_state.data is None or st.session_state.get('data_source') == 'database':
+        filter_options = get_product_filter_options()
+        use_database = filter_options['has_products']
+    
+    if not use_database and st.session_state.data is None:
         st.warning("No data available. Please extract data from PDFs in the Data Extraction page.")
     else:
         # Filters
@@ -609,11 +651,11 @@ elif page == "Price Comparison":
             search_query = st.text_input("Search Products", "")
         
         with col2:
-            categories = st.session_state.data['category'].dropna().unique()
+            categories = filter_options['categories'] if use_database else st.session_state.data['category'].dropna().unique()
             selected_category = st.selectbox("Category", ["All"] + list(categories))
         
         with col3:
-            markets = st.session_state.data['market'].unique()
+            markets = filter_options['markets'] if use_database else st.session_state.data['market'].unique()
             selected_markets = st.multiselect("Markets", options=markets, default=list(markets))
         
         col4, col5 = st.columns(2)
@@ -625,15 +667,38 @@ elif page == "Price Comparison":
             max_price = st.number_input("Max Price", min_value=0.0, value=1000.0, step=1.0)
         
         # Apply filters
-        data = st.session_state.data
-        
-        # Filter by search query
-        if search_query:
-            data = search_products(data, search_query)
-        
-        # Filter by category, price range, and markets
         category_filter = None if selected_category == "All" else selected_category
-        data = filter_data(data, category=category_filter, min_price=min_price, max_price=max_price, markets=selected_markets)
+        
+        if use_database:
+            filters = {
+                'search': search_query or None,
+                'category': category_filter,
+                # No market selected matches every market, as in filter_data
+                'markets': selected_markets,
+                'min_price': min_price,
+                'max_price': max_price
+            }
+            # Count the matching products only when the filters or the
+            # stored products change
+            filters_key = {**filters, 'version': filter_options['version']}
+            if st.session_state.get('comparison_filters') != filters_key:
+                st.session_state.comparison_filters = filters_key
+                st.session_state.comparison_count = count_products(**filters)
+            product_count = st.session_state.comparison_count
+            
+            page_count = max(1, -(-product_count // COMPARISON_PAGE_SIZE))
+            page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1) if page_count > 1 else 1
+            data = query_products(**filters, limit=COMPARISON_PAGE_SIZE, offset=(page_number - 1) * COMPARISON_PAGE_SIZE)
+        else:
+            data = st.session_state.data
+            
+            # Filter by search query
+            if search_query:
+                data = search_products(data, search_query)
+            
+            # Filter by category, price range, and markets
+            data = filter_data(data, category=category_filter, min_price=min_price, max_price=max_price, markets=selected_markets)
+            product_count = len(data)
         
         st.session_state.filtered_data = data
         
@@ -642,6 +707,8 @@ elif page == "Price Comparison":
             st.warning("No products match your filters.")
         else:
             st.subheader("Product List")
+            if use_database:
+                st.caption(f"{product_count} products, showing {len(data)} on page {page_number} of {page_count}")
             st.dataframe(data)
             
             # Product comparison
@@ -654,7 +721,12 @@ elif page == "Price Comparison":
                 selected_product = st.selectbox("Select a product to compare", product_names)
                 
                 # Get data for the selected product across markets
-                product_data = data[data['name'] == selected_product]
+                if use_database:
+                    # The other markets' offers may be on other pages
+                    product_data = query_products(**{**filters, 'search': selected_product})
+                    product_data = product_data[product_data['name'] == selected_product]
+                else:
+                    product_data = data[data['name'] == selected_product]
                 
                 if len(product_data) > 1:
                     # Create comparison chart
@@ -670,124 +742,167 @@ elif page == "Price Comparison":
 elif page == "Web Scraping":
     st.header("Web Scraping")
     st.write("Scrape product prices from websites")
+    st.caption("Prices are scraped on a schedule by `python scrape_daemon.py`, so the data in the dashboard "
+               "stays fresh without scraping here. The buttons below start a scrape in the background; "
+               "the dashboard keeps working and reads the new prices once they are stored.")
+    
+    scrape_process = st.session_state.get('scrape_process')
+    scrape_running = scrape_process is not None and scrape_process.poll() is None
     
     # Add sections for different stores
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         st.subheader("Stokomak Products")
         st.write("Scrape product prices from stokomak.com.mk")
+        scrape_stokomak = st.button("Scrape Stokomak Prices", disabled=scrape_running)
     
     with col2:
         st.subheader("Vero Products")
         st.write("Scrape product prices from Vero's price list")
+        scrape_vero = st.button("Scrape Vero Prices", disabled=scrape_running)
+    
+    with col3:
+        st.subheader("All Retailers")
+        st.write("Scrape every registered retailer")
+        scrape_all = st.button("Scrape All Retailers", disabled=scrape_running)
+    
+    if scrape_stokomak or scrape_vero or scrape_all:
+        if not setup_database():
+            st.error("Failed to set up database. Please check your database connection.")
+        else:
+            retailers = None if scrape_all else ['Stokomak'] if scrape_stokomak else ['Vero']
+            st.session_state.scrape_process = start_scrape(retailers)
+            st.session_state.scrape_retailers = ', '.join(retailers) if retailers else "all retailers"
+            st.session_state.scrape_seen = False
+            st.rerun()
+    
+    # Status of the background scrape started from this session
+    if scrape_process is not None:
+        scrape_log = ""
+        if os.path.exists(SCRAPE_LOG_PATH):
+            with open(SCRAPE_LOG_PATH, encoding='utf-8', errors='replace') as f:
+                scrape_log = f.read()[-5000:]
         
-        if st.button("Scrape Vero Prices"):
-            with st.spinner("Scraping products from Vero..."):
-                setup_result = setup_database()
-                
-                if not setup_result:
-                    st.error("Failed to set up database. Please check your database connection.")
-                else:
-                    scraped_products = scrape_vero_prices()
-                    
-                    if scraped_products is None or scraped_products.empty:
-                        st.error("Could not scrape products from Vero. Please try again later.")
-                    else:
-                        storage_result = store_scraped_products(scraped_products)
-                        
-                        if not storage_result:
-                            st.error("Failed to store products in the database.")
-                        else:
-                            st.success(f"Successfully scraped and stored {len(scraped_products)} products from Vero")
-                            st.dataframe(scraped_products)
-                            
-                            csv = scraped_products.to_csv(index=False).encode('utf-8')
-                            st.download_button(
-                                "Download Scraped Data as CSV",
-                                csv,
-                                "vero_prices.csv",
-                                "text/csv",
-                                key='download-vero-csv'
-                            )
-    
-    # Create a button to start scraping
-    if st.button("Scrape Stokomak Prices"):
-        # Show a spinner while scraping
-        with st.spinner("Scraping products from Stokomak..."):
-            # Create the database tables if they don't exist
-            setup_result = setup_database()
-            
-            if not setup_result:
-                st.error("Failed to set up database. Please check your database connection.")
-            else:
-                # Scrape the products
-                scraped_products = scrape_stokomak_prices()
-                
-                if scraped_products is None or scraped_products.empty:
-                    st.error("Could not scrape products from Stokomak. Please try again later.")
-                else:
-                    # Store the scraped products in the database
-                    storage_result = store_scraped_products(scraped_products)
-                    
-                    if not storage_result:
-                        st.error("Failed to store products in the database.")
-                    else:
-                        st.success(f"Successfully scraped and stored {len(scraped_products)} products from Stokomak!")
-                        
-                        # Display the scraped data
-                        st.write("**Scraped Products:**")
-                        st.dataframe(scraped_products)
-                        
-                        # Update the session state with the combined data (previous data + new data)
-                        db_products = get_products_from_db()
-                        if not db_products.empty:
-                            st.session_state.data = db_products
-                            st.session_state.filtered_data = db_products
-                        
-                        # Option to save to CSV
-                        csv = scraped_products.to_csv(index=False).encode('utf-8')
-                        st.download_button(
-                            "Download Scraped Data as CSV",
-                            csv,
-                            "stokomak_prices.csv",
-                            "text/csv",
-                            key='download-scraped-csv'
-                        )
+        if scrape_running:
+            st.info(f"Scraping {st.session_state.scrape_retailers} in the background...")
+            st.button("Refresh Status")
+        elif scrape_process.returncode == 0:
+            st.success(f"Scraped and stored the products of {st.session_state.scrape_retailers}.")
+        else:
+            st.error(f"Scraping {st.session_state.scrape_retailers} failed for some pages or could not store the products.")
+        
+        if not scrape_running and not st.session_state.scrape_seen:
+            # Read the stored products again on the other pages
+            st.session_state.scrape_seen = True
+            st.session_state.data_source = 'database'
+            st.session_state.pop('home_filters', None)
+        
+        if scrape_log:
+            with st.expander("Scrape log", expanded=not scrape_running):
+                st.code(scrape_log)
     
     # Add instructions for the web scraping feature
     with st.expander("Instructions"):
         st.write("""
-        1. Click the "Scrape Stokomak Prices" button to start the scraping process.
-        2. The system will connect to stokomak.com.mk and extract product prices.
-        3. The scraped data will be automatically saved to the database.
-        4. The product data will become available in the Price Comparison and Market Analysis pages.
-        5. You can download the scraped data as a CSV file.
+        1. Click one of the scrape buttons to start scraping in the background.
+        2. The scraper connects to the retailer websites and extracts product prices.
+        3. The scraped data is saved to the database; refresh the status to see when it is done.
+        4. The product data will become available in the Home, Price Comparison and Market Analysis pages.
+        5. Run `python scrape_daemon.py` to keep the prices up to date on a schedule.
         """)
     
     # Section to load data from database
     st.subheader("Database Products")
     if st.button("Load Products from Database"):
         with st.spinner("Loading products from database..."):
-            db_products = get_products_from_db()
+            # The pages query the stored products themselves, a page at a time
+            product_count = count_products()
             
-            if db_products.empty:
+            if product_count == 0:
                 st.warning("No products found in the database.")
             else:
-                st.success(f"Successfully loaded {len(db_products)} products from the database!")
-                st.session_state.data = db_products
-                st.session_state.filtered_data = db_products
+                st.success(f"Successfully loaded {product_count} products from the database!")
+                st.session_state.data_source = 'database'
+                # Count the products on Home again
+                st.session_state.pop('home_filters', None)
                 
-                # Display the loaded data
+                # Display the first products
                 st.write("**Database Products:**")
-                st.dataframe(db_products)
+                st.dataframe(query_products(limit=HOME_PAGE_SIZE))
 
 # Market Analysis Page
 elif page == "Market Analysis":
     st.header("Market Analysis")
     st.write("Analyze and compare market data")
     
-    if st.session_state.data is None:
+    # Products stored in the database are analyzed from the price aggregates
+    # kept up to date on every store, without loading the products
+    use_database = False
+    if st.session_state.data is None or st.session_state.get('data_source') == 'database':
+        filter_options = get_product_filter_options()
+        use_database = filter_options['has_products']
+    
+    if use_database:
+        selected_category = st.selectbox("Filter by Category", ["All"] + list(filter_options['categories']))
+        
+        if selected_category == "All":
+            market_stats = get_price_stats('market')
+        else:
+            market_stats = get_price_stats('market_category', category=selected_category)
+        
+        if market_stats.empty:
+            st.warning("No data available for the selected category.")
+        else:
+            # Market price comparison
+            st.subheader("Average Price Comparison")
+            fig_market = create_market_comparison_chart(None, stats=market_stats)
+            st.plotly_chart(fig_market, use_container_width=True)
+            
+            # Product distribution
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.subheader("Product Distribution by Market")
+                fig_pie = px.pie(
+                    names=market_stats['market'],
+                    values=market_stats['product_count'],
+                    title="Number of Products by Market"
+                )
+                st.plotly_chart(fig_pie, use_container_width=True)
+            
+            with col2:
+                st.subheader("Price Statistics")
+                st.dataframe(
+                    market_stats[['market', 'product_count', 'mean_price', 'median_price', 'min_price', 'max_price']].rename(columns={
+                        'market': 'Market', 'product_count': 'Products', 'mean_price': 'Mean',
+                        'median_price': 'Median', 'min_price': 'Min', 'max_price': 'Max'
+                    }),
+                    hide_index=True,
+                    use_container_width=True
+                )
+            
+            if selected_category == "All":
+                category_stats = get_price_stats('category')
+                if not category_stats.empty:
+                    st.subheader("Average Price by Category")
+                    fig_category = create_category_comparison_chart(None, stats=category_stats)
+                    st.plotly_chart(fig_category, use_container_width=True)
+            
+            # Market insights
+            st.subheader("Market Insights")
+            
+            cheapest_market = market_stats.loc[market_stats['mean_price'].idxmin()]
+            st.write(f"✅ **{cheapest_market['market']}** offers the lowest average prices overall.")
+            
+            # Display product count by market
+            st.write("**Product counts by market:**")
+            for market, count in zip(market_stats['market'], market_stats['product_count']):
+                st.write(f"- **{market}**: {count} products")
+            
+            st.caption(f"Statistics refreshed {market_stats['refreshed_at'].max():%Y-%m-%d %H:%M}")
+    
+    elif st.session_state.data is None:
         st.warning("No data available. Please extract data from PDFs in the Data Extraction page.")
     else:
         # Filters for analysis
@@ -0,0 +1,64 @@
+"""
+Benchmark of KAM category classification.
+
+Compares the keyword loop previously used by derive_category_from_name,
+called once per name, with derive_categories_from_names, which classifies the
+whole column with the compiled keyword pattern, and checks that both give the
+same categories.
+
+Usage:
+    python benchmarks/bench_category_classifier.py [--count N] [--distinct N]
+
+Names are sampled from data/kam_prices.csv and made distinct with a numeric
+suffix, so the benchmark does not profit from repeated names unless asked to.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.kam_extractor import KAM_CATEGORY_KEYWORDS, derive_categories_from_names
+
+def legacy_derive_category_from_name(product_name):
+    """The per-category, per-keyword substring loop used before the classifier."""
+    product_lower = product_name.lower()
+    for category, keywords in KAM_CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword.lower() in product_lower:
+                return category
+    return "Останато"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--count', type=int, default=1000000, help='number of names to classify')
+    parser.add_argument('--distinct', type=int, default=None, help='number of distinct names (default: all distinct)')
+    args = parser.parse_args()
+
+    base_names = pd.read_csv(os.path.join('data', 'kam_prices.csv'))['name'].astype(str).tolist()
+    distinct = args.distinct or args.count
+    random.seed(42)
+    pool = [f"{random.choice(base_names)} {i}" for i in range(distinct)]
+    names = pd.Series([pool[i % distinct] for i in range(args.count)], dtype=object)
+
+    start = time.perf_counter()
+    before = [legacy_derive_category_from_name(name) for name in names]
+    before_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = derive_categories_from_names(names)
+    after_time = time.perf_counter() - start
+
+    mismatches = sum(old != new for old, new in zip(before, after))
+
+    print(f"Names:      {len(names):,} ({distinct:,} distinct)")
+    print(f"Mismatches: {mismatches}")
+    print(f"Before:     {before_time:.2f}s ({len(names) / before_time:,.0f} names/s)")
+    print(f"After:      {after_time:.2f}s ({len(names) / after_time:,.0f} names/s, {before_time / after_time:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Micro-benchmark of the KAM product line parser.
+
+Compares the single-pass KAM_LINE_PATTERN parser with the previous
+implementation, which ran a separate re.search for every field, over every
+line of a KAM price list, and checks that both produce the same fields.
+
+Usage:
+    python benchmarks/bench_kam_line_parser.py [path] [--repeat N]
+
+The path may be a KAM PDF or a plain text dump of one (default: data/kam_ceni.pdf).
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.kam_extractor import parse_kam_line, derive_category_from_name
+
+def legacy_parse_kam_line(line):
+    """The per-field re.search parser used before KAM_LINE_PATTERN."""
+    price_match = re.search(r'(\d+)ден\.', line)
+    if not price_match:
+        return None
+
+    line_parts = line.split(price_match.group(0), 1)
+    product_name = line_parts[0].strip()
+    rest_of_line = line_parts[1].strip()
+
+    unit_price_match = re.search(r'(\d+) гр = ([\d\.]+)', rest_of_line)
+    unit_price = None
+    if unit_price_match:
+        unit_price = unit_price_match.group(0)
+
+    description = None
+    if unit_price and unit_price in rest_of_line:
+        desc_parts = rest_of_line.split(unit_price, 1)
+        if len(desc_parts) >= 2:
+            if "Да" in desc_parts[1]:
+                description = desc_parts[1].split("Да")[0].strip()
+
+    regular_price_match = re.search(r'Да\s+(\d+)ден\.', rest_of_line)
+    regular_price = None
+    if regular_price_match:
+        regular_price = regular_price_match.group(1)
+
+    discount_price = None
+    discount_percent = None
+    if "попуст" in rest_of_line.lower():
+        discount_match = re.search(r'попуст\s*\((%)\)\s*(\d+)', rest_of_line, re.IGNORECASE)
+        if discount_match:
+            discount_percent = discount_match.group(2)
+        discount_price_match = re.search(r'Цена со\s+попуст\s+(\d+)', rest_of_line, re.IGNORECASE)
+        if discount_price_match:
+            discount_price = discount_price_match.group(1)
+
+    return {
+        'name': product_name,
+        'price': price_match.group(1),
+        'unit_price': unit_price,
+        'description': description,
+        'regular_price': regular_price,
+        'discounted_price': discount_price,
+        'discount_percent': discount_percent,
+        'category': derive_category_from_name(product_name)
+    }
+
+def load_lines(path):
+    """Read every text line of a KAM PDF, or of a text dump of one."""
+    with open(path, 'rb') as f:
+        is_pdf = f.read(5) == b'%PDF-'
+
+    if is_pdf:
+        import pdfplumber
+        lines = []
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                lines.extend((page.extract_text() or '').split('\n'))
+        return lines
+
+    with open(path, encoding='utf-8') as f:
+        return f.read().split('\n')
+
+def time_parser(parse, lines, repeat):
+    """Return the best lines-per-second rate of parse over the lines."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            parse(line)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(lines) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('path', nargs='?', default=os.path.join('data', 'kam_ceni.pdf'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    lines = load_lines(args.path)
+    fields = ['name', 'price', 'unit_price', 'description', 'regular_price', 'discounted_price', 'discount_percent', 'category']
+    mismatches = 0
+    for line in lines:
+        new = parse_kam_line(line)
+        old = legacy_parse_kam_line(line)
+        if (new and {field: new[field] for field in fields}) != old:
+            mismatches += 1
+            print(f"Mismatch: {line!r}")
+
+    before = time_parser(legacy_parse_kam_line, lines, args.repeat)
+    after = time_parser(parse_kam_line, lines, args.repeat)
+
+    print(f"Lines:      {len(lines)}")
+    print(f"Mismatches: {mismatches}")
+    print(f"Before:     {before:,.0f} lines/s")
+    print(f"After:      {after:,.0f} lines/s ({after / before:.1f}x)")
+
+if __name__ == '__main__':
+    main()
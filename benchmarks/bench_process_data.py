@@ -0,0 +1,118 @@
+"""
+Benchmark of process_data on a merged multi-chain product list.
+
+Compares the previous pipeline, where clean_data, remove_duplicates and
+standardize_categories each copied the data, with the fused pipeline of
+process_data, and checks that both give the same products. Reports time and
+peak memory, from tracemalloc and samples of pyarrow's memory pool.
+
+Usage:
+    python benchmarks/bench_process_data.py [--rows N] [--chains N]
+
+Products are generated from the names in data/kam_prices.csv and
+data/sample_data.csv, with messy whitespace and case, categories spelled in
+different ways, duplicates and invalid prices.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_processor import CATEGORY_MAPPING, _memory_profile, process_data
+
+def legacy_process_data(extracted_data_list):
+    """The pipeline before fusing: three stages, each starting with data.copy()."""
+    combined_data = pd.concat(extracted_data_list, ignore_index=True)
+
+    df = combined_data.copy()
+    df['name'] = df['name'].str.lower()
+    df['name'] = df['name'].str.strip()
+    df['market'] = df['market'].str.title()
+    if df['price'].dtype != 'float64':
+        df['price'] = pd.to_numeric(df['price'], errors='coerce')
+    df = df.dropna(subset=['name', 'price', 'market'])
+    df = df[df['price'] < 10000]
+    df = df[df['price'] > 0]
+    df['name'] = df['name'].str.title()
+
+    df = df.copy()
+    df = df.sort_values(['market', 'price'])
+    df = df.drop_duplicates(subset=['name', 'market'], keep='first')
+
+    df = df.copy()
+    if 'category' not in df.columns:
+        df['category'] = 'Uncategorized'
+    df['category'] = df['category'].fillna('Uncategorized')
+    df['category'] = df['category'].str.title()
+    for variant, standard in CATEGORY_MAPPING.items():
+        df.loc[df['category'] == variant, 'category'] = standard
+    return df
+
+def generate_chains(rows, chains):
+    """Build one product list per chain, as extracted from their price lists."""
+    names = pd.concat([
+        pd.read_csv(os.path.join('data', 'kam_prices.csv'))['name'],
+        pd.read_csv(os.path.join('data', 'sample_data.csv'))['name']
+    ]).dropna().astype(str).unique()
+    categories = list(CATEGORY_MAPPING) + sorted(set(CATEGORY_MAPPING.values()))
+    categories += [category.upper() for category in categories[:10]] + [None]
+    rng = np.random.default_rng(42)
+    random.seed(42)
+
+    per_chain = -(-rows // chains)
+    frames = []
+    for chain in range(chains):
+        # Package sizes make most products distinct, as in real price lists
+        name = [f"{n} {size} гр" for n, size in zip(rng.choice(names, per_chain), rng.integers(1, 1000, per_chain))]
+        # Same product written with different case and padding
+        name = [random.choice([n, n.lower(), f" {n} ", n.upper()]) for n in name]
+        price = rng.uniform(1, 2000, per_chain).round(2)
+        price[rng.random(per_chain) < 0.02] = 0
+        price[rng.random(per_chain) < 0.01] = 25000
+        frames.append(pd.DataFrame({
+            'name': name,
+            'price': price,
+            'category': rng.choice(np.array(categories, dtype=object), per_chain),
+            'market': random.choice(['market', 'MARKET', 'Market']) + f" {chain}",
+            'unit_price': None,
+            'description': name,
+            'last_updated': '2025-04-18'
+        }))
+    return frames
+
+def measure(func, frames):
+    with _memory_profile() as peak:
+        start = time.perf_counter()
+        df = func(frames)
+        elapsed = time.perf_counter() - start
+    return df, elapsed, peak['python'] + peak['arrow']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--rows', type=int, default=1000000, help='number of product rows')
+    parser.add_argument('--chains', type=int, default=5, help='number of product lists merged')
+    args = parser.parse_args()
+
+    frames = generate_chains(args.rows, args.chains)
+    input_size = sum(frame.memory_usage(deep=True).sum() for frame in frames)
+
+    before, before_time, before_peak = measure(legacy_process_data, frames)
+    after, after_time, after_peak = measure(process_data, frames)
+
+    print(f"Rows:      {sum(len(frame) for frame in frames):,} in {len(frames)} lists "
+          f"({input_size / 1024 / 1024:.1f} MiB), {len(after):,} after processing")
+    print(f"Identical: {before.equals(after) and before.index.equals(after.index)}")
+    print(f"Previous:  {before_time:.2f}s, peak {before_peak / 1024 / 1024:.1f} MiB")
+    print(f"Fused:     {after_time:.2f}s, peak {after_peak / 1024 / 1024:.1f} MiB "
+          f"({before_time / after_time:.1f}x faster, {before_peak / after_peak:.1f}x less memory)")
+    print()
+    process_data(frames, profile=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Offline benchmark and regression check of every registered retailer parser.
+
+Replays the recorded HTTP fixtures of each retailer's pages, times the
+parser, checks that the output follows RETAILER_COLUMNS and compares it with
+the expected products saved next to the fixtures.
+
+Usage:
+    python benchmarks/bench_retailers.py --record      # fetch and record the pages once
+    python benchmarks/bench_retailers.py --update      # save the current output as expected
+    python benchmarks/bench_retailers.py [--repeat N]  # replay, time and compare
+
+Fixtures are read from HTTP_FIXTURE_DIR (default: data/fixtures/http), so no
+network access is needed after recording. The fixtures and expected output of
+every registered retailer are committed there; a new retailer needs both, and
+the expected output is updated along with any intended parser change.
+"""
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.http_cache import DEFAULT_FIXTURE_DIR, fetch_page
+from utils.retailers import RETAILERS, RETAILER_COLUMNS, parse_retailer_page
+
+# Stamped with the day of parsing, so left out of the comparison
+VOLATILE_COLUMNS = ['last_updated']
+
+def expected_path(name, fixture_dir):
+    return os.path.join(fixture_dir, 'expected', f"{name.lower()}.csv")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--record', action='store_true', help='fetch every page and record it as a fixture')
+    parser.add_argument('--update', action='store_true', help='save the parsed products as the expected output')
+    parser.add_argument('--repeat', type=int, default=5, help='parses per page, the best is reported')
+    parser.add_argument('--fixture-dir', default=DEFAULT_FIXTURE_DIR, help='directory of the fixtures')
+    args = parser.parse_args()
+
+    mode = 'record' if args.record else 'replay'
+    failed = False
+
+    for name, retailer in RETAILERS.items():
+        frames = []
+        parse_time = 0.0
+        size = 0
+        for url in retailer['urls']:
+            try:
+                html = fetch_page(url, mode=mode, fixture_dir=args.fixture_dir)
+            except Exception as e:
+                print(f"{name}: {e}")
+                failed = True
+                continue
+
+            size += len(html)
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                df = parse_retailer_page(name, html, url)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            parse_time += best
+            frames.append(df)
+
+        if not frames:
+            continue
+
+        df = pd.concat(frames, ignore_index=True)
+        schema_ok = list(df.columns) == RETAILER_COLUMNS
+        rate = len(df) / parse_time if parse_time else 0
+        print(f"{name}: {len(df):,} products from {size / 1024:,.0f} KiB in {parse_time:.3f}s "
+              f"({rate:,.0f} rows/s), schema {'ok' if schema_ok else 'MISMATCH'}")
+        failed |= not schema_ok
+
+        # Compared as CSV text, which is how the expected output is stored
+        path = expected_path(name, args.fixture_dir)
+        actual = df.drop(columns=VOLATILE_COLUMNS).to_csv(index=False)
+        if args.update:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(actual)
+            print(f"  saved expected output to {path}")
+        elif os.path.exists(path):
+            with open(path, encoding='utf-8', newline='') as f:
+                matches = f.read() == actual
+            print(f"  expected output: {'identical' if matches else 'DIFFERENT'}")
+            failed |= not matches
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Benchmark of the category mapping of standardize_categories.
+
+Compares the previous loop, one full-column comparison and assignment per
+variant in CATEGORY_MAPPING, with mapping the distinct categories once, and
+checks that both give the same categories.
+
+Usage:
+    python benchmarks/bench_standardize_categories.py [--rows N] [--repeat N]
+
+Categories are drawn from the variants and standard names of
+CATEGORY_MAPPING, the categories of data/kam_prices.csv and missing values,
+in mixed case.
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_processor import CATEGORY_MAPPING, standardize_categories
+
+def legacy_standardize_categories(data):
+    """The mapping loop used before, one pass over the column per variant."""
+    df = data.copy()
+    if 'category' not in df.columns:
+        df['category'] = 'Uncategorized'
+    df['category'] = df['category'].fillna('Uncategorized')
+    df['category'] = df['category'].str.title()
+    for variant, standard in CATEGORY_MAPPING.items():
+        df.loc[df['category'] == variant, 'category'] = standard
+    return df
+
+def generate_products(rows):
+    categories = list(CATEGORY_MAPPING) + sorted(set(CATEGORY_MAPPING.values()))
+    categories += pd.read_csv(os.path.join('data', 'kam_prices.csv'))['category'].dropna().unique().tolist()
+    categories += [category.lower() for category in categories] + [category.upper() for category in categories]
+    categories.append(None)
+    rng = np.random.default_rng(42)
+    return pd.DataFrame({
+        'name': 'product',
+        'price': rng.uniform(1, 2000, rows).round(2),
+        'category': rng.choice(np.array(categories, dtype=object), rows),
+        'market': 'Market'
+    })
+
+def time_function(func, df, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--rows', type=int, default=1000000, help='number of product rows')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per implementation, the best is reported')
+    args = parser.parse_args()
+
+    df = generate_products(args.rows)
+
+    before, before_time = time_function(legacy_standardize_categories, df, args.repeat)
+    after, after_time = time_function(standardize_categories, df, args.repeat)
+
+    print(f"Rows:       {len(df):,}, {df['category'].nunique():,} distinct categories, "
+          f"{after['category'].nunique():,} after standardizing")
+    print(f"Identical:  {before.equals(after)}")
+    print(f"Loop:       {before_time:.3f}s ({len(df) / before_time:,.0f} rows/s)")
+    print(f"Vectorized: {after_time:.3f}s ({len(df) / after_time:,.0f} rows/s, {before_time / after_time:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark of the Python side of store_scraped_products.
+
+Compares building one tuple per row with iterrows(), as the execute_values
+insert did before, with the column-wise CSV serialization fed to COPY.
+With --store and DATABASE_URL set, also times the whole load into the
+database.
+
+Usage:
+    python benchmarks/bench_store_products.py [--rows N] [--store]
+
+Rows are taken from data/kam_prices.csv, repeated up to N rows.
+"""
+import io
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import _to_staging_frame, store_scraped_products
+
+def legacy_build_tuples(products_df):
+    """The per-market iterrows() loop used with execute_values before COPY."""
+    batches = []
+    for market in products_df['market'].unique():
+        market_products = products_df[products_df['market'] == market]
+        product_data = []
+        for _, row in market_products.iterrows():
+            product_data.append((
+                row['name'],
+                row['price'],
+                row.get('unit_price', None),
+                row.get('category', 'Uncategorized'),
+                market,
+                row.get('image_url', None),
+                row.get('description', None),
+                row.get('availability', None),
+                row.get('regular_price', None),
+                row.get('discounted_price', None),
+                row.get('discount_percent', None),
+                row.get('discount_type', None),
+                row.get('discount_period', None),
+                row.get('last_updated', None),
+                row.get('source_document', None)
+            ))
+        batches.append(product_data)
+    return batches
+
+def build_csv(products_df):
+    buffer = io.StringIO()
+    market_ids = {name: market_id for market_id, name in enumerate(products_df['market'].unique())}
+    _to_staging_frame(products_df, market_ids).to_csv(buffer, index=False, header=False)
+    return buffer
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--rows', type=int, default=500000, help='number of product rows')
+    parser.add_argument('--store', action='store_true', help='also store the rows in DATABASE_URL')
+    args = parser.parse_args()
+
+    base = pd.read_csv(os.path.join('data', 'kam_prices.csv'))
+    repeats = -(-args.rows // len(base))
+    products_df = pd.concat([base] * repeats, ignore_index=True).iloc[:args.rows]
+
+    start = time.perf_counter()
+    legacy_build_tuples(products_df)
+    before_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buffer = build_csv(products_df)
+    after_time = time.perf_counter() - start
+
+    print(f"Rows:           {len(products_df):,}")
+    print(f"iterrows:       {before_time:.2f}s ({len(products_df) / before_time:,.0f} rows/s)")
+    print(f"CSV for COPY:   {after_time:.2f}s ({len(products_df) / after_time:,.0f} rows/s, "
+          f"{before_time / after_time:.0f}x, {buffer.tell() / 1024 / 1024:.1f} MiB)")
+
+    if args.store:
+        if not os.getenv('DATABASE_URL'):
+            print("DATABASE_URL is not set, skipping --store")
+            return
+        start = time.perf_counter()
+        stored = store_scraped_products(products_df)
+        store_time = time.perf_counter() - start
+        print(f"Store:          {store_time:.2f}s ({len(products_df) / store_time:,.0f} rows/s, stored={stored})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark of the Vero price list HTML parser backends.
+
+Parses the same page with BeautifulSoup's html.parser tree walk and with the
+lxml backend of parse_vero_prices, and checks that both give the same products.
+
+Usage:
+    python benchmarks/bench_vero_parser.py [page.html] [--rows N] [--repeat N]
+
+Without a page, a price list in Vero's layout is generated with N product rows
+using product names from data/kam_prices.csv.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from html import escape
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.web_scraper import parse_vero_prices
+
+def generate_page(rows):
+    """Build a Vero-style price list: category header rows followed by product rows."""
+    names = pd.read_csv(os.path.join('data', 'kam_prices.csv'))['name'].astype(str).tolist()
+    random.seed(42)
+
+    parts = ['<html><head><meta charset="utf-8"><title>Ценовник</title></head><body><table>']
+    for i in range(rows):
+        if i % 50 == 0:
+            parts.append(f'<tr><th colspan="3">Категорија {i // 50}</th></tr>')
+        name = escape(random.choice(names))
+        price = f"{random.randint(10, 5000)},{random.randint(0, 99):02d}"
+        parts.append(
+            f'<tr><td class="name"><span>{name}</span></td>'
+            f'<td class="code">{100000 + i}</td>'
+            f'<td class="price"><b>{price}</b> ден</td></tr>'
+        )
+    parts.append('</table></body></html>')
+    return '\n'.join(parts)
+
+def time_parser(html, parser, repeat):
+    best = None
+    df = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = parse_vero_prices(html, parser=parser)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return df, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('page', nargs='?', help='saved Vero price list page')
+    parser.add_argument('--rows', type=int, default=20000, help='product rows of the generated page')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per backend, the best is reported')
+    args = parser.parse_args()
+
+    if args.page:
+        with open(args.page, encoding='utf-8') as f:
+            html = f.read()
+    else:
+        html = generate_page(args.rows)
+
+    before, before_time = time_parser(html, 'html.parser', args.repeat)
+    after, after_time = time_parser(html, 'lxml', args.repeat)
+
+    print(f"Page:        {len(html) / 1024:,.0f} KiB, {len(before):,} products")
+    print(f"Identical:   {before.equals(after)}")
+    print(f"html.parser: {before_time:.3f}s ({len(before) / before_time:,.0f} rows/s)")
+    print(f"lxml:        {after_time:.3f}s ({len(after) / after_time:,.0f} rows/s, {before_time / after_time:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Batch ingestion of price-list PDFs into the database.
+
+Usage:
+    python ingest.py data/pdfs
+    python ingest.py "incoming/*.pdf" --workers 4 --kam-mode table
+    python ingest.py attached_assets/kam_ceni.pdf --dry-run
+
+Each PDF is routed to the KAM extractor when it looks like a KAM price list
+and to the generic extractor otherwise. Files are extracted concurrently in a
+process pool and the results are stored in one batch.
+"""
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+import pdfplumber
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.pdf_extractor import extract_prices_from_pdf, EXTRACTOR_VERSION
+from utils.kam_extractor import extract_kam_prices_from_pdf, KAM_EXTRACTOR_VERSION, KAM_MODES
+from utils.extraction_cache import cached_extraction
+from utils.database import setup_database, store_scraped_products
+
+# Text printed at the top of every KAM price list
+KAM_MARKER = 'Датум и време на последно ажурирање на цените'
+
+def find_pdfs(paths):
+    """
+    Expand directories and glob patterns into a sorted list of PDF files.
+
+    Parameters:
+    -----------
+    paths : list of str
+        Files, directories or glob patterns
+
+    Returns:
+    --------
+    list of str
+        Paths of the PDF files found
+    """
+    pdf_paths = set()
+    for path in paths:
+        if os.path.isdir(path):
+            pattern = os.path.join(path, '**', '*')
+            pdf_paths.update(p for p in glob.glob(pattern, recursive=True) if _is_pdf(p))
+        elif glob.has_magic(path):
+            # Price lists are often saved as .PDF, so match the extension in any case
+            pattern = re.sub(r'\.pdf$', '.[pP][dD][fF]', path, flags=re.IGNORECASE)
+            pdf_paths.update(p for p in glob.glob(pattern, recursive=True) if _is_pdf(p))
+        elif os.path.isfile(path):
+            pdf_paths.add(path)
+        else:
+            print(f"Skipping {path}: no such file or directory")
+    return sorted(pdf_paths)
+
+def _is_pdf(path):
+    return os.path.isfile(path) and path.lower().endswith('.pdf')
+
+def is_kam_price_list(pdf_path):
+    """Check whether a PDF is a KAM price list, by file name or by its first page."""
+    if 'kam' in os.path.basename(pdf_path).lower():
+        return True
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            if not pdf.pages:
+                return False
+            return KAM_MARKER in (pdf.pages[0].extract_text() or '')
+    except Exception:
+        return False
+
+def ingest_file(pdf_path, kam_mode='text', use_cache=True):
+    """
+    Extract one PDF with the matching extractor.
+
+    Runs in a worker process, so it only returns plain data.
+
+    Returns:
+    --------
+    dict
+        path, extractor, data (DataFrame), seconds and error (None on success)
+    """
+    start = time.perf_counter()
+    extractor = 'generic'
+    try:
+        if is_kam_price_list(pdf_path):
+            extractor = 'kam'
+            extract_func = extract_kam_prices_from_pdf
+            version = KAM_EXTRACTOR_VERSION
+            kwargs = {'mode': kam_mode}
+        else:
+            extract_func = extract_prices_from_pdf
+            version = EXTRACTOR_VERSION
+            kwargs = {}
+
+        if use_cache:
+            df = cached_extraction(pdf_path, extract_func, version, **kwargs)
+        else:
+            df = extract_func(pdf_path, **kwargs)
+
+        if df is not None and not df.empty:
+            df = df.assign(source_document=os.path.basename(pdf_path))
+        error = None if df is not None and not df.empty else "no products extracted"
+    except Exception as e:
+        df = pd.DataFrame()
+        error = str(e)
+
+    return {
+        'path': pdf_path,
+        'extractor': extractor,
+        'data': df,
+        'seconds': time.perf_counter() - start,
+        'error': error
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract price-list PDFs and load them into the database.")
+    parser.add_argument('paths', nargs='+', help='PDF files, directories or glob patterns')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of files extracted in parallel')
+    parser.add_argument('--kam-mode', choices=KAM_MODES, default='text', help='extraction mode for KAM price lists')
+    parser.add_argument('--no-cache', action='store_true', help='always extract, ignoring the extraction cache')
+    parser.add_argument('--dry-run', action='store_true', help='extract only, without writing to the database')
+    args = parser.parse_args(argv)
+
+    pdf_paths = find_pdfs(args.paths)
+    if not pdf_paths:
+        print("No PDF files found.")
+        return 1
+
+    print(f"Ingesting {len(pdf_paths)} PDF files with {args.workers} workers")
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(ingest_file, pdf_path, args.kam_mode, not args.no_cache)
+            for pdf_path in pdf_paths
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result['error']:
+                print(f"  FAILED {result['path']} ({result['extractor']}, {result['seconds']:.2f}s): {result['error']}")
+            else:
+                print(f"  {result['path']} ({result['extractor']}): {len(result['data'])} products in {result['seconds']:.2f}s")
+    extract_seconds = time.perf_counter() - start
+
+    frames = [result['data'] for result in results if not result['error']]
+    total_rows = sum(len(frame) for frame in frames)
+    failed = sum(1 for result in results if result['error'])
+
+    stored = True
+    store_seconds = 0.0
+    if frames and not args.dry_run:
+        store_start = time.perf_counter()
+        stored = setup_database() and store_scraped_products(pd.concat(frames, ignore_index=True))
+        store_seconds = time.perf_counter() - store_start
+        if not stored:
+            print("Failed to store products in the database.")
+
+    total_seconds = time.perf_counter() - start
+    print(f"Extracted {total_rows} products from {len(results) - failed}/{len(results)} files in {extract_seconds:.2f}s "
+          f"({len(results) / extract_seconds:.2f} files/s, {total_rows / extract_seconds:.0f} products/s)")
+    if frames and not args.dry_run:
+        print(f"Stored in {store_seconds:.2f}s")
+    print(f"Total {total_seconds:.2f}s")
+
+    return 0 if stored and not failed else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
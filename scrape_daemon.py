@@ -0,0 +1,195 @@
+"""
+Background scraper: scrapes every registered retailer on a schedule and
+stores the products in the database, so the dashboard only reads fresh data.
+
+Usage:
+    python scrape_daemon.py
+    python scrape_daemon.py --interval 21600 --retailer-interval Vero=3600
+    python scrape_daemon.py --once --dry-run
+    python scrape_daemon.py --once --retailer Vero
+
+Requests to each host are rate limited with a token bucket, and failed
+requests are retried with jittered exponential backoff. Stop with Ctrl+C or
+SIGTERM; the current scrape is finished first.
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+import subprocess
+import requests
+import pandas as pd
+from urllib.parse import urlsplit
+from utils.http_cache import fetch_page
+from utils.rate_limit import TokenBucket, call_with_retries
+from utils.retailers import RETAILERS, parse_retailer_page
+from utils.database import setup_database, store_scraped_products
+
+DEFAULT_INTERVAL = 6 * 60 * 60
+# Requests per second to one host, and how many may be sent back to back
+DEFAULT_HOST_RATE = 0.5
+DEFAULT_HOST_BURST = 2
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 30
+# Output of the scrapes started by start_scrape
+SCRAPE_LOG_PATH = os.path.join('data', 'cache', 'scrape_daemon.log')
+
+def start_scrape(retailers=None, log_path=SCRAPE_LOG_PATH):
+    """
+    Scrape retailers once in a separate background process and store the products.
+
+    Used by the dashboard, so a scrape requested there never blocks it.
+
+    Parameters:
+    -----------
+    retailers : list of str, optional
+        Names of the retailers to scrape (default: all registered)
+    log_path : str, optional
+        File receiving the output of the scrape, replaced on every start
+
+    Returns:
+    --------
+    subprocess.Popen
+        The scrape process; its return code is 0 when every retailer was
+        scraped and stored
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    args = [sys.executable, '-u', os.path.join(root, 'scrape_daemon.py'), '--once']
+    for name in retailers or []:
+        args += ['--retailer', name]
+
+    log_path = os.path.join(root, log_path)
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, 'w', encoding='utf-8') as log:
+        # A new session keeps the scrape running if the dashboard restarts
+        return subprocess.Popen(args, cwd=root, stdout=log, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, start_new_session=True)
+
+def scrape_retailer(name, retailer, buckets, session, retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT):
+    """
+    Scrape all pages of one retailer, waiting for the host's token bucket before each request.
+
+    Parameters:
+    -----------
+    name : str
+        Name of the retailer in the registry
+    retailer : dict
+        Registry entry with the urls and parse function
+    buckets : dict
+        TokenBucket of every host, keyed by host name
+    session : requests.Session
+        Session reused for all requests
+    retries : int, optional
+        Retries of a failed request
+    timeout : float, optional
+        Timeout of a single request in seconds
+
+    Returns:
+    --------
+    list of pandas.DataFrame
+        Products of every page that was scraped successfully
+    """
+    def fetch(url):
+        buckets[urlsplit(url).netloc].acquire()
+        return fetch_page(url, session, timeout=timeout)
+
+    frames = []
+    for url in retailer['urls']:
+        try:
+            html = call_with_retries(fetch, url, retries=retries, retry_if=is_transient_error)
+            df = parse_retailer_page(name, html, url, {name: retailer})
+            print(f"Scraped {len(df)} products from {name} ({url})")
+            if not df.empty:
+                frames.append(df)
+        except Exception as e:
+            print(f"Error scraping {name} ({url}): {e}")
+    return frames
+
+def is_transient_error(error):
+    """Check whether a failed request may succeed when retried: network errors, 429 and 5xx responses."""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, requests.RequestException)
+
+def parse_intervals(values, default):
+    """Turn NAME=SECONDS arguments into the scrape interval of every registered retailer."""
+    intervals = {name: default for name in RETAILERS}
+    for value in values or []:
+        name, _, seconds = value.partition('=')
+        if name not in RETAILERS:
+            raise ValueError(f"Unknown retailer: {name}")
+        intervals[name] = float(seconds)
+    return intervals
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape all retailers on a schedule and store the products.")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='seconds between scrapes of a retailer')
+    parser.add_argument('--retailer-interval', action='append', metavar='NAME=SECONDS', help='interval of one retailer')
+    parser.add_argument('--host-rate', type=float, default=DEFAULT_HOST_RATE, help='requests per second to one host')
+    parser.add_argument('--host-burst', type=int, default=DEFAULT_HOST_BURST, help='requests sent to a host back to back')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help='retries of a failed request')
+    parser.add_argument('--retailer', action='append', metavar='NAME', help='scrape only this retailer (repeatable)')
+    parser.add_argument('--once', action='store_true', help='scrape every retailer once and exit')
+    parser.add_argument('--dry-run', action='store_true', help='scrape only, without writing to the database')
+    args = parser.parse_args(argv)
+
+    try:
+        intervals = parse_intervals(args.retailer_interval, args.interval)
+    except ValueError as e:
+        parser.error(str(e))
+
+    unknown = set(args.retailer or []) - set(RETAILERS)
+    if unknown:
+        parser.error(f"Unknown retailer: {', '.join(sorted(unknown))}")
+    retailers = {name: retailer for name, retailer in RETAILERS.items() if not args.retailer or name in args.retailer}
+
+    if not args.dry_run and not setup_database():
+        print("Failed to set up the database.")
+        return 1
+
+    stop = threading.Event()
+    def request_stop(signum, frame):
+        print("Stopping after the current scrape...")
+        stop.set()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    buckets = {}
+    for retailer in retailers.values():
+        for url in retailer['urls']:
+            buckets.setdefault(urlsplit(url).netloc, TokenBucket(args.host_rate, args.host_burst))
+
+    next_run = {name: time.monotonic() for name in retailers}
+    failed = False
+
+    with requests.Session() as session:
+        while not stop.is_set():
+            now = time.monotonic()
+            for name, retailer in retailers.items():
+                if stop.is_set() or next_run[name] > now:
+                    continue
+
+                start = time.perf_counter()
+                frames = scrape_retailer(name, retailer, buckets, session, args.retries)
+                rows = sum(len(frame) for frame in frames)
+                stored = True
+                if frames and not args.dry_run:
+                    stored = store_scraped_products(pd.concat(frames, ignore_index=True))
+                    if not stored:
+                        print(f"Failed to store products of {name} in the database.")
+                failed |= not frames or not stored
+                print(f"{name}: {rows} products in {time.perf_counter() - start:.2f}s, next scrape in {intervals[name]:.0f}s")
+                next_run[name] = time.monotonic() + intervals[name]
+
+            if args.once:
+                break
+            # Sleep until the next retailer is due, waking up early on stop
+            stop.wait(max(0, min(next_run.values()) - time.monotonic()))
+
+    return 1 if args.once and failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
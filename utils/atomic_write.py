@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+def write_atomic(path, write, suffix='.tmp'):
+    """
+    Write a file through a temporary file next to it.
+
+    The temporary file is moved onto path only once it is complete, so
+    readers never see a partial file and a failed write leaves an existing
+    file untouched. Every write gets a unique temporary name, which keeps
+    concurrent writers of the same path apart.
+
+    Parameters:
+    -----------
+    path : str
+        Path of the file to write
+    write : callable
+        Called with the temporary path to write the content to. Returning
+        False discards what was written and keeps the existing file.
+    suffix : str, optional
+        Suffix of the temporary file, for writers that infer the format
+        from the extension
+
+    Returns:
+    --------
+    object
+        The result of write
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=suffix)
+    os.close(fd)
+    try:
+        result = write(tmp_path)
+        if result is not False:
+            os.replace(tmp_path, path)
+        return result
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
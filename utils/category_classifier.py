@@ -0,0 +1,122 @@
+import re
+import pandas as pd
+
+def compile_category_keywords(category_keywords):
+    """
+    Compile a category keyword mapping into a single keyword pattern.
+
+    Parameters:
+    -----------
+    category_keywords : dict
+        Mapping of category name to a list of keywords, in priority order
+
+    Returns:
+    --------
+    dict
+        Compiled classifier to pass to classify_name and classify_names
+    """
+    categories = list(category_keywords)
+
+    # A keyword listed under several categories belongs to the first one
+    keyword_priority = {}
+    for priority, keywords in enumerate(category_keywords.values()):
+        for keyword in keywords:
+            keyword_priority.setdefault(keyword.lower(), priority)
+
+    # The pattern reports the longest keyword starting at each position, so
+    # a match also stands for every shorter keyword that is a prefix of it
+    match_priority = {
+        keyword: min(
+            priority for prefix, priority in keyword_priority.items()
+            if keyword.startswith(prefix)
+        )
+        for keyword in keyword_priority
+    }
+
+    # The keyword trie wrapped in a lookahead, so that overlapping keywords
+    # are all found in a single scan of the text
+    pattern = re.compile('(?=(' + _trie_pattern(keyword_priority) + '))')
+
+    return {
+        'pattern': pattern,
+        'categories': categories,
+        'match_priority': match_priority
+    }
+
+def _trie_pattern(keywords):
+    """Build a regex alternation of the keywords with shared prefixes merged."""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        # An empty key marks the end of a keyword
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        alternation = '(?:' + '|'.join(branches) + ')'
+        # A keyword ends here, so the longer continuations are optional
+        return alternation + '?' if '' in node else alternation
+
+    return build(trie)
+
+def classify_name(name, classifier, default=None):
+    """
+    Return the first category, in priority order, with a keyword contained in the name.
+
+    Gives the same result as looping over every category and keyword with a
+    substring test, but scans the name once.
+
+    Parameters:
+    -----------
+    name : str
+        Product name or other text to classify
+    classifier : dict
+        Classifier from compile_category_keywords
+    default : str, optional
+        Category returned when no keyword matches
+
+    Returns:
+    --------
+    str
+        Matched category or default
+    """
+    keywords = classifier['pattern'].findall(name.lower())
+    if not keywords:
+        return default
+
+    match_priority = classifier['match_priority']
+    return classifier['categories'][min(match_priority[keyword] for keyword in keywords)]
+
+def classify_names(names, classifier, default=None):
+    """
+    Classify a column of names in one call.
+
+    Each distinct name is classified once and the results are mapped back
+    onto the column, so repeated names cost a dictionary lookup.
+
+    Parameters:
+    -----------
+    names : pandas.Series or list
+        Names to classify
+    classifier : dict
+        Classifier from compile_category_keywords
+    default : str, optional
+        Category used when no keyword matches
+
+    Returns:
+    --------
+    pandas.Series
+        Category of every name, aligned with names
+    """
+    names = pd.Series(names, dtype=object)
+    categories = {
+        name: classify_name(name, classifier, default)
+        for name in pd.unique(names.dropna())
+    }
+    return names.map(categories).where(names.notna(), default)
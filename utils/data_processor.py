@@ -1,13 +1,102 @@
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 
-def process_data(extracted_data_list):
+try:
+    # String columns are stored in pyarrow buffers, which tracemalloc does not see
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Seconds between two readings of the Arrow memory while profiling
+ARROW_SAMPLE_INTERVAL = 0.001
+
+# Variations of category names mapped to standard names
+CATEGORY_MAPPING = {
+    'Electronic': 'Electronics',
+    'Electronics & Computers': 'Electronics',
+    'Computer': 'Electronics',
+    'Tv': 'Electronics',
+    'Phone': 'Electronics',
+    
+    'Grocery': 'Groceries',
+    'Food': 'Groceries',
+    'Food Items': 'Groceries',
+    
+    'Fruit': 'Produce',
+    'Fruits': 'Produce',
+    'Vegetables': 'Produce',
+    'Vegetable': 'Produce',
+    'Fresh Produce': 'Produce',
+    
+    'Meats': 'Meat & Seafood',
+    'Seafood': 'Meat & Seafood',
+    'Fish': 'Meat & Seafood',
+    
+    'Dairy Products': 'Dairy',
+    
+    'Baked Goods': 'Bakery',
+    'Bread': 'Bakery',
+    
+    'Drinks': 'Beverages',
+    'Soda': 'Beverages',
+    'Water': 'Beverages',
+    'Coffee & Tea': 'Beverages',
+    'Alcohol': 'Beverages',
+    
+    'Cleaning': 'Household',
+    'Household Items': 'Household',
+    'Household Supplies': 'Household',
+    
+    'Personal': 'Personal Care',
+    'Beauty': 'Personal Care',
+    'Health': 'Personal Care',
+    'Health & Beauty': 'Personal Care',
+    
+    'Clothes': 'Clothing',
+    'Apparel': 'Clothing',
+    
+    'Home': 'Home & Garden',
+    'Garden': 'Home & Garden',
+    'Furniture': 'Home & Garden',
+    'Decor': 'Home & Garden',
+    
+    'Baby Products': 'Baby',
+    'Baby Items': 'Baby',
+    
+    'Pet Supplies': 'Pet',
+    'Pet Food': 'Pet',
+    
+    'Toys': 'Toys & Games',
+    'Games': 'Toys & Games',
+    
+    'Sports': 'Sports & Outdoors',
+    'Outdoors': 'Sports & Outdoors',
+    'Fitness': 'Sports & Outdoors'
+}
+
+# Rows priced outside this range are treated as extraction errors
+MAX_PRICE = 10000
+
+def process_data(extracted_data_list, profile=False):
     """
     Process and combine extracted data from multiple PDFs.
     
+    Runs clean_data, remove_duplicates and standardize_categories as one
+    pipeline: the combined data is normalized in place, and the rows kept
+    are selected once, so only the combined data and the result are
+    allocated in full.
+    
     Parameters:
     -----------
     extracted_data_list : list of pandas.DataFrame
         List of DataFrames containing extracted product data
+    profile : bool, optional
+        Print the time of every stage and the peak memory allocated
+        (measured with tracemalloc, which slows processing down)
         
     Returns:
     --------
@@ -17,19 +106,125 @@ def process_data(extracted_data_list):
     if not extracted_data_list:
         return pd.DataFrame()
     
-    # Combine all dataframes
-    combined_data = pd.concat(extracted_data_list, ignore_index=True)
+    timings = {}
+    stage_start = time.perf_counter()
     
-    # Clean the data
-    clean_data_df = clean_data(combined_data)
+    def end_stage(name):
+        nonlocal stage_start
+        now = time.perf_counter()
+        timings[name] = now - stage_start
+        stage_start = now
     
-    # Remove duplicates
-    deduplicated_df = remove_duplicates(clean_data_df)
+    with _memory_profile(enabled=profile) as peak:
+        # Combine all dataframes; the only copy of the input
+        df = pd.concat(extracted_data_list, ignore_index=True)
+        end_stage('combine')
+        
+        # Clean the data
+        _normalize_columns(df)
+        valid = _valid_rows(df)
+        end_stage('clean')
+        
+        # Remove duplicates, selecting the rows kept in their final order
+        df = df.take(_deduplicated_positions(df, valid))
+        end_stage('deduplicate')
+        
+        # Standardize categories
+        df['category'] = _standardize_category_column(df)
+        end_stage('categories')
     
-    # Standardize categories
-    standardized_df = standardize_categories(deduplicated_df)
+    if profile:
+        stages = ', '.join(f"{name} {seconds:.3f}s" for name, seconds in timings.items())
+        print(f"Processed {len(df)} products in {sum(timings.values()):.3f}s ({stages}), "
+              f"peak memory {peak['python'] / 1024 / 1024:.1f} MiB Python/NumPy, "
+              f"{peak['arrow'] / 1024 / 1024:.1f} MiB Arrow")
     
-    return standardized_df
+    return df
+
+@contextmanager
+def _memory_profile(enabled=True):
+    """
+    Measure the peak memory allocated in a block.
+    
+    Yields a dict that is filled on exit with the peak bytes allocated by
+    Python and NumPy ('python', from tracemalloc) and the peak growth of
+    pyarrow's default memory pool ('arrow'). The pool has no peak that can
+    be reset, so a thread samples it during the block; it is shared by the
+    process, so allocations of other threads are included. Does nothing when
+    enabled is False.
+    """
+    peak = {'python': 0, 'arrow': 0}
+    if not enabled:
+        yield peak
+        return
+    
+    tracing = not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+    
+    done = threading.Event()
+    if pa is not None:
+        pool = pa.default_memory_pool()
+        baseline = pool.bytes_allocated()
+        
+        def sample_arrow():
+            while True:
+                peak['arrow'] = max(peak['arrow'], pool.bytes_allocated() - baseline)
+                if done.wait(ARROW_SAMPLE_INTERVAL):
+                    break
+        
+        sampler = threading.Thread(target=sample_arrow, daemon=True)
+        sampler.start()
+    
+    try:
+        yield peak
+    finally:
+        peak['python'] = tracemalloc.get_traced_memory()[1]
+        if tracing:
+            tracemalloc.stop()
+        if pa is not None:
+            done.set()
+            sampler.join()
+
+def _normalize_columns(df):
+    """Normalize the name, market and price columns of df in place, one pass per column."""
+    # Title case also lowercases the rest of every word
+    df['name'] = df['name'].str.strip().str.title()
+    df['market'] = df['market'].str.title()
+    if df['price'].dtype != 'float64':
+        df['price'] = pd.to_numeric(df['price'], errors='coerce')
+
+def _valid_rows(df):
+    """Boolean mask of the rows with a name, a market and a plausible price."""
+    # Missing prices fail both comparisons
+    return df['name'].notna() & df['market'].notna() & (df['price'] > 0) & (df['price'] < MAX_PRICE)
+
+def _deduplicated_positions(df, rows):
+    """
+    Positions of the rows kept by remove_duplicates, among the rows selected by a mask.
+    
+    Only the key columns are sorted, instead of the whole data.
+    """
+    rows = rows.to_numpy()
+    keys = df.loc[rows, ['market', 'price', 'name']].reset_index(drop=True)
+    keys['position'] = np.flatnonzero(rows)
+    keys = keys.sort_values(['market', 'price'])
+    return keys.loc[~keys.duplicated(subset=['name', 'market']), 'position'].to_numpy()
+
+def _standardize_category_column(df):
+    """Return the standardized category column of df, 'Uncategorized' when missing."""
+    if 'category' not in df.columns:
+        return pd.Series('Uncategorized', index=df.index)
+    
+    # A price list has few distinct categories, so they are title-cased and
+    # mapped once each, then spread back to the rows by their codes
+    codes, categories = pd.factorize(df['category'].fillna('Uncategorized'))
+    categories = pd.Index(categories).str.title()
+    categories = categories.map(lambda category: CATEGORY_MAPPING.get(category, category))
+    
+    return pd.Series(categories.take(codes), index=df.index, name='category')
 
 def clean_data(data):
     """
@@ -48,35 +243,18 @@ def clean_data(data):
     # Make a copy to avoid modifying original data
     df = data.copy()
     
-    # Convert to lowercase for standardization
-    df['name'] = df['name'].str.lower()
-    
-    # Remove leading/trailing whitespace
-    df['name'] = df['name'].str.strip()
-    
-    # Ensure market names are consistent (Title case)
-    df['market'] = df['market'].str.title()
-    
-    # Convert price to float if not already
-    if df['price'].dtype != 'float64':
-        df['price'] = pd.to_numeric(df['price'], errors='coerce')
+    _normalize_columns(df)
     
-    # Remove rows with missing essential data
-    df = df.dropna(subset=['name', 'price', 'market'])
-    
-    # Remove entries with suspicious values (e.g., extremely high prices)
-    df = df[df['price'] < 10000]  # Assuming no reasonable item costs more than $10,000
-    df = df[df['price'] > 0]      # Remove free or negative-priced items
-    
-    # Capitalize product names for display
-    df['name'] = df['name'].str.title()
-    
-    return df
+    # Remove rows with missing essential data or suspicious prices
+    return df[_valid_rows(df)]
 
 def remove_duplicates(data):
     """
     Remove duplicate product entries.
     
+    Keeps the lowest price entry of every product in every market, sorted by
+    market and price.
+    
     Parameters:
     -----------
     data : pandas.DataFrame
@@ -87,16 +265,7 @@ def remove_duplicates(data):
     pandas.DataFrame
         Data with duplicates removed
     """
-    # Make a copy
-    df = data.copy()
-    
-    # Sort by market and price to keep the lowest price entry for exact duplicates
-    df = df.sort_values(['market', 'price'])
-    
-    # Drop duplicates - keeping the first occurrence (lowest price) for the same product and market
-    df = df.drop_duplicates(subset=['name', 'market'], keep='first')
-    
-    return df
+    return data.take(_deduplicated_positions(data, pd.Series(True, index=data.index)))
 
 def standardize_categories(data):
     """
@@ -114,85 +283,7 @@ def standardize_categories(data):
     """
     # Make a copy
     df = data.copy()
-    
-    # Ensure the category column exists
-    if 'category' not in df.columns:
-        df['category'] = 'Uncategorized'
-    
-    # Fill missing categories
-    df['category'] = df['category'].fillna('Uncategorized')
-    
-    # Standardize category names to title case
-    df['category'] = df['category'].str.title()
-    
-    # Map variations of categories to standard names
-    category_mapping = {
-        'Electronic': 'Electronics',
-        'Electronics & Computers': 'Electronics',
-        'Computer': 'Electronics',
-        'Tv': 'Electronics',
-        'Phone': 'Electronics',
-        
-        'Grocery': 'Groceries',
-        'Food': 'Groceries',
-        'Food Items': 'Groceries',
-        
-        'Fruit': 'Produce',
-        'Fruits': 'Produce',
-        'Vegetables': 'Produce',
-        'Vegetable': 'Produce',
-        'Fresh Produce': 'Produce',
-        
-        'Meats': 'Meat & Seafood',
-        'Seafood': 'Meat & Seafood',
-        'Fish': 'Meat & Seafood',
-        
-        'Dairy Products': 'Dairy',
-        
-        'Baked Goods': 'Bakery',
-        'Bread': 'Bakery',
-        
-        'Drinks': 'Beverages',
-        'Soda': 'Beverages',
-        'Water': 'Beverages',
-        'Coffee & Tea': 'Beverages',
-        'Alcohol': 'Beverages',
-        
-        'Cleaning': 'Household',
-        'Household Items': 'Household',
-        'Household Supplies': 'Household',
-        
-        'Personal': 'Personal Care',
-        'Beauty': 'Personal Care',
-        'Health': 'Personal Care',
-        'Health & Beauty': 'Personal Care',
-        
-        'Clothes': 'Clothing',
-        'Apparel': 'Clothing',
-        
-        'Home': 'Home & Garden',
-        'Garden': 'Home & Garden',
-        'Furniture': 'Home & Garden',
-        'Decor': 'Home & Garden',
-        
-        'Baby Products': 'Baby',
-        'Baby Items': 'Baby',
-        
-        'Pet Supplies': 'Pet',
-        'Pet Food': 'Pet',
-        
-        'Toys': 'Toys & Games',
-        'Games': 'Toys & Games',
-        
-        'Sports': 'Sports & Outdoors',
-        'Outdoors': 'Sports & Outdoors',
-        'Fitness': 'Sports & Outdoors'
-    }
-    
-    # Apply mapping to standardize categories
-    for variant, standard in category_mapping.items():
-        df.loc[df['category'] == variant, 'category'] = standard
-    
+    df['category'] = _standardize_category_column(df)
     return df
 
 def filter_data(data, category=None, min_price=None, max_price=None, markets=None):
@@ -1,13 +1,114 @@
+import io
 import os
+import time
+import threading
+import uuid
+from datetime import timedelta
 import pandas as pd
 import psycopg2
+from contextlib import contextmanager
 from psycopg2 import sql
-from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+
+# Size of the process-wide connection pool. DB_POOL_MIN connections are
+# kept open between uses; connections opened beyond that under load are
+# closed again when returned, up to DB_POOL_MAX open at once.
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '4'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+# Seconds to wait for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+# Pooled connections idle for longer than this are checked before they are reused
+DB_POOL_CHECK_AFTER = float(os.getenv('DB_POOL_CHECK_AFTER', '30'))
+
+# Columns of the products table written by store_scraped_products
+PRODUCT_COLUMNS = [
+    'name', 'price', 'unit_price', 'category', 'market_id', 'image_url', 'description',
+    'availability', 'regular_price', 'discounted_price', 'discount_percent',
+    'discount_type', 'discount_period', 'last_updated', 'source_document'
+]
+
+# Columns compared by upsert_products to decide whether a stored product changed
+PRICE_COLUMNS = [
+    'price', 'regular_price', 'discounted_price', 'discount_percent',
+    'discount_type', 'discount_period'
+]
+
+# Columns of the price_observations history table
+OBSERVATION_COLUMNS = [
+    'product_id', 'market_id', 'observed_on', 'price', 'regular_price',
+    'discounted_price', 'discount_percent', 'discount_type', 'discount_period',
+    'source_document'
+]
+
+# SQL expressions normalizing a product name, the unit of its unit price
+# ('100 гр = 9.2' -> '100 гр') and its description into the natural key of
+# the products table. Price lists repeat short names like 'АЈВАР ЛУТ' for
+# different products, which the description (brand, variety) tells apart.
+NAME_KEY_SQL = "lower(regexp_replace(btrim({}), '\\s+', ' ', 'g'))"
+UNIT_KEY_SQL = "coalesce(lower(regexp_replace(btrim(substring({} from '^([^=]*)=')), '\\s+', ' ', 'g')), '')"
+DESCRIPTION_KEY_SQL = "coalesce(lower(regexp_replace(btrim({}), '\\s+', ' ', 'g')), '')"
+NATURAL_KEY_COLUMNS = ['market_id', 'name_key', 'unit_key', 'description_key']
+
+# Staging table the products are copied into
+STAGING_COLUMNS = {
+    'name': 'VARCHAR(255)',
+    'price': 'NUMERIC(15, 2)',
+    'unit_price': 'VARCHAR(255)',
+    'category': 'VARCHAR(255)',
+    'market_id': 'INTEGER',
+    'image_url': 'VARCHAR(512)',
+    'description': 'TEXT',
+    'availability': 'VARCHAR(50)',
+    'regular_price': 'NUMERIC(15, 2)',
+    'discounted_price': 'NUMERIC(15, 2)',
+    'discount_percent': 'NUMERIC(5, 2)',
+    'discount_type': 'VARCHAR(255)',
+    'discount_period': 'VARCHAR(255)',
+    'last_updated': 'DATE',
+    'source_document': 'VARCHAR(255)',
+    # Position in the stored DataFrame, so the last of duplicate rows wins
+    'row_index': 'BIGINT'
+}
+
+# Rows fetched per round trip by the batch iterators
+DB_FETCH_SIZE = int(os.getenv('DB_FETCH_SIZE', '10000'))
+
+# Types of the columns read by the batch iterators; other columns are text
+COLUMN_TYPES = {
+    'id': 'int',
+    'product_id': 'int',
+    'market_id': 'int',
+    'price': 'float',
+    'regular_price': 'float',
+    'discounted_price': 'float',
+    'discount_percent': 'float',
+    'last_updated': 'date',
+    'observed_on': 'date'
+}
+
+# Rows serialized and copied at a time by store_scraped_products
+COPY_CHUNK_ROWS = 100000
+
+# Transaction-level advisory lock taken by refresh_price_stats
+PRICE_STATS_LOCK_ID = 7126001
+
+# Id of every market name seen by this process, filled by upsert_products
+_market_ids = {}
+_market_ids_lock = threading.Lock()
+
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+# Time each pooled connection was last returned, keyed by id(connection)
+_last_used = {}
 
 def get_db_connection():
     """
     Establishes a connection to the PostgreSQL database using environment variables.
     
+    Opens a new, unpooled connection that the caller must close. Prefer
+    db_connection(), which borrows one from the connection pool.
+    
     Returns:
     --------
     connection: psycopg2.connection
@@ -19,6 +120,100 @@ def get_db_connection():
     conn = psycopg2.connect(DATABASE_URL)
     return conn
 
+def get_connection_pool():
+    """
+    Return the process-wide connection pool, creating it on first use.
+    
+    Returns:
+    --------
+    psycopg2.pool.ThreadedConnectionPool
+        Pool of connections to DATABASE_URL, shared by all threads.
+    """
+    global _pool, _pool_slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+                _pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, os.getenv('DATABASE_URL'))
+    return _pool
+
+def close_connection_pool():
+    """Close every pooled connection. The next db_connection() creates a new pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a healthy connection from the pool for the duration of a with block.
+    
+    The transaction is committed when the block succeeds and rolled back
+    when it raises, and the connection is returned to the pool either way.
+    When all connections are in use, waits up to DB_POOL_TIMEOUT seconds
+    for one to be returned.
+    
+    Yields:
+    -------
+    connection: psycopg2.connection
+        A pooled connection to the PostgreSQL database.
+    """
+    pool = get_connection_pool()
+    # ThreadedConnectionPool raises instead of waiting when it is exhausted
+    if not _pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise PoolError(f"No database connection available after {DB_POOL_TIMEOUT:.0f}s")
+    try:
+        conn = _checkout_healthy_connection(pool)
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            # Also when a generator holding the connection is closed early
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                # The connection itself failed, so it can't go back to the pool
+                broken = True
+            raise
+        finally:
+            pool.putconn(conn, close=broken or conn.closed != 0)
+            if conn.closed == 0:
+                _last_used[id(conn)] = time.monotonic()
+            else:
+                _last_used.pop(id(conn), None)
+    finally:
+        _pool_slots.release()
+
+def _checkout_healthy_connection(pool):
+    """Get a connection from the pool, discarding ones the server has closed."""
+    # After a server restart every idle connection may be dead
+    for _ in range(DB_POOL_MAX + 1):
+        conn = pool.getconn()
+        if _is_healthy(conn):
+            return conn
+        _last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+    raise PoolError("Could not get a working database connection")
+
+def _is_healthy(conn):
+    """Check a pooled connection, pinging the server only when it has been idle for a while."""
+    if conn.closed != 0:
+        return False
+    last_used = _last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used <= DB_POOL_CHECK_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
 def setup_database():
     """
     Sets up the necessary database tables if they don't exist yet.
@@ -29,57 +224,276 @@ def setup_database():
         True if setup was successful, False otherwise.
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Create markets table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS markets (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(255) NOT NULL UNIQUE,
-                logo_url VARCHAR(512),
-                website VARCHAR(512)
-            )
-        """)
-        
-        # Create products table with the new schema for KAM data
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS products (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                price NUMERIC(15, 2) NOT NULL,
-                unit_price VARCHAR(255),
-                category VARCHAR(255),
-                market_id INTEGER REFERENCES markets(id),
-                image_url VARCHAR(512),
-                description TEXT,
-                availability VARCHAR(50),
-                regular_price NUMERIC(15, 2),
-                discounted_price NUMERIC(15, 2),
-                discount_percent NUMERIC(5, 2),
-                discount_type VARCHAR(255),
-                discount_period VARCHAR(255),
-                last_updated DATE,
-                source_document VARCHAR(255)
-            )
-        """)
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_connection() as conn, conn.cursor() as cur:
+            _create_tables(cur)
         return True
     except Exception as e:
         print(f"Database setup error: {e}")
         return False
 
-def store_scraped_products(products_df):
+def _create_tables(cur):
+    """Create the markets and products tables if they don't exist yet."""
+    # Create markets table
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS markets (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL UNIQUE,
+            logo_url VARCHAR(512),
+            website VARCHAR(512)
+        )
+    """)
+    
+    # Create products table with the new schema for KAM data
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            price NUMERIC(15, 2) NOT NULL,
+            unit_price VARCHAR(255),
+            category VARCHAR(255),
+            market_id INTEGER REFERENCES markets(id),
+            image_url VARCHAR(512),
+            description TEXT,
+            availability VARCHAR(50),
+            regular_price NUMERIC(15, 2),
+            discounted_price NUMERIC(15, 2),
+            discount_percent NUMERIC(5, 2),
+            discount_type VARCHAR(255),
+            discount_period VARCHAR(255),
+            last_updated DATE,
+            source_document VARCHAR(255)
+        )
+    """)
+    
+    # The natural key is added on first use, also to tables created before it
+    # or before the description was part of it (products_natural_key)
+    cur.execute("SELECT to_regclass('products_product_key')")
+    if cur.fetchone()[0] is None:
+        # Computed by the database, so every writer normalizes the key the same way
+        cur.execute(f"""
+            ALTER TABLE products
+            ADD COLUMN IF NOT EXISTS name_key TEXT
+                GENERATED ALWAYS AS ({NAME_KEY_SQL.format('name')}) STORED,
+            ADD COLUMN IF NOT EXISTS unit_key TEXT
+                GENERATED ALWAYS AS ({UNIT_KEY_SQL.format('unit_price')}) STORED,
+            ADD COLUMN IF NOT EXISTS description_key TEXT
+                GENERATED ALWAYS AS ({DESCRIPTION_KEY_SQL.format('description')}) STORED
+        """)
+        
+        # Older tables hold a copy of every product per scrape; keep only the
+        # most recently stored one
+        cur.execute(f"""
+            DELETE FROM products p
+            USING products newer
+            WHERE {' AND '.join(f'newer.{column} = p.{column}' for column in NATURAL_KEY_COLUMNS)}
+              AND newer.id > p.id
+        """)
+        cur.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS products_product_key
+            ON products ({', '.join(NATURAL_KEY_COLUMNS)})
+        """)
+        cur.execute("DROP INDEX IF EXISTS products_natural_key")
+    
+    _create_product_indexes(cur)
+    
+    cur.execute("SELECT to_regclass('price_observations')")
+    if cur.fetchone()[0] is None:
+        _create_price_observations(cur)
+    
+    cur.execute("SELECT to_regclass('product_price_stats')")
+    if cur.fetchone()[0] is None:
+        _create_price_stats(cur)
+
+def _create_product_indexes(cur):
+    """Create the indexes behind the filters of query_products."""
+    # B-tree indexes for the category filter, the price range and the sort
+    # order; the market filter uses the natural key, which starts with market_id
+    indexes = {
+        'products_category': "(category)",
+        'products_price': "(price)",
+        'products_name': "(name, id)"
+    }
+    for index, columns in indexes.items():
+        # CREATE INDEX takes a SHARE lock on products until commit even when
+        # the index exists, which would block concurrent loads
+        cur.execute("SELECT to_regclass(%s)", (index,))
+        if cur.fetchone()[0] is None:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {index} ON products {columns}")
+    
+    cur.execute("SELECT to_regclass('products_name_trgm')")
+    if cur.fetchone()[0] is not None:
+        return
+    
+    # Trigram indexes let ILIKE '%text%' searches use an index. Creating the
+    # extension needs privileges the database user may not have, in which
+    # case searches fall back to a sequential scan.
+    cur.execute("SAVEPOINT trigram_indexes")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cur.execute("CREATE INDEX IF NOT EXISTS products_name_trgm ON products USING gin (name gin_trgm_ops)")
+        cur.execute("CREATE INDEX IF NOT EXISTS products_category_trgm ON products USING gin (category gin_trgm_ops)")
+        cur.execute("RELEASE SAVEPOINT trigram_indexes")
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT trigram_indexes")
+        print(f"Could not create trigram indexes, product search will not be indexed: {e}")
+
+def _create_price_observations(cur):
+    """
+    Create the price history table, seeded with the current price of every product.
+    
+    Only changes are recorded, so a product's price on a day is its last
+    observation on or before that day.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS price_observations (
+            product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+            market_id INTEGER NOT NULL REFERENCES markets(id),
+            observed_on DATE NOT NULL,
+            price NUMERIC(15, 2) NOT NULL,
+            regular_price NUMERIC(15, 2),
+            discounted_price NUMERIC(15, 2),
+            discount_percent NUMERIC(5, 2),
+            discount_type VARCHAR(255),
+            discount_period VARCHAR(255),
+            source_document VARCHAR(255)
+        ) PARTITION BY RANGE (observed_on)
+    """)
+    
+    # Observations arrive roughly in date order, so a BRIN index stays tiny
+    # and still lets date range scans skip most blocks
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS price_observations_observed_on
+        ON price_observations USING brin (observed_on)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS price_observations_product
+        ON price_observations (product_id, observed_on)
+    """)
+    
+    _create_month_partitions(cur, "SELECT coalesce(last_updated, CURRENT_DATE) FROM products")
+    cur.execute(f"""
+        INSERT INTO price_observations ({', '.join(OBSERVATION_COLUMNS)})
+        SELECT id, market_id, coalesce(last_updated, CURRENT_DATE),
+               {', '.join(OBSERVATION_COLUMNS[3:])}
+        FROM products
+        WHERE market_id IS NOT NULL
+    """)
+
+def _create_price_stats(cur):
+    """
+    Create the table of price aggregates read by the dashboard and fill it.
+    
+    Each row aggregates the products of one market, one category or one
+    category in one market, as told by grouped_by ('market', 'category' or
+    'market_category'); the column not grouped by is NULL.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS product_price_stats (
+            grouped_by VARCHAR(20) NOT NULL,
+            market_id INTEGER REFERENCES markets(id) ON DELETE CASCADE,
+            category VARCHAR(255),
+            product_count INTEGER NOT NULL,
+            mean_price NUMERIC(15, 2),
+            median_price NUMERIC(15, 2),
+            min_price NUMERIC(15, 2),
+            max_price NUMERIC(15, 2),
+            refreshed_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """)
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS product_price_stats_group
+        ON product_price_stats (grouped_by, coalesce(market_id, 0), coalesce(category, ''))
+    """)
+    refresh_price_stats(cur)
+
+def refresh_price_stats(cur, market_ids=None, categories=None):
+    """
+    Recompute the price aggregates, all of them or only the affected ones.
+    
+    Parameters:
+    -----------
+    cur : psycopg2.cursor
+        Cursor of the transaction that changed the products
+    market_ids : list of int, optional
+        Markets whose products changed; their market and market/category
+        aggregates are recomputed
+    categories : list of str, optional
+        Categories whose products changed (None for products without one);
+        their aggregates over all markets are recomputed
+    
+    With neither market_ids nor categories, every aggregate is recomputed.
+    Refreshes are serialized until the transaction ends: concurrent loads
+    touching the same groups would otherwise not see each other's
+    uncommitted aggregates and insert them twice.
+    """
+    # Statements after the lock see the aggregates of loads committed meanwhile
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (PRICE_STATS_LOCK_ID,))
+    
+    params = {
+        'market_ids': list(market_ids or []),
+        # NULL categories are compared as '' so they can be passed in an array
+        'categories': ['' if category is None else category for category in categories or []]
+    }
+    
+    if market_ids is None and categories is None:
+        delete_filter = market_filter = category_filter = ""
+    else:
+        delete_filter = """
+            WHERE (grouped_by IN ('market', 'market_category') AND market_id = ANY(%(market_ids)s))
+               OR (grouped_by = 'category' AND coalesce(category, '') = ANY(%(categories)s))
+        """
+        market_filter = "WHERE market_id = ANY(%(market_ids)s)"
+        category_filter = "WHERE coalesce(category, '') = ANY(%(categories)s)"
+    
+    cur.execute(f"DELETE FROM product_price_stats {delete_filter}", params)
+    
+    aggregates = """
+        count(*), avg(price), percentile_cont(0.5) WITHIN GROUP (ORDER BY price),
+        min(price), max(price)
+    """
+    cur.execute(f"""
+        INSERT INTO product_price_stats
+        (grouped_by, market_id, category, product_count, mean_price, median_price, min_price, max_price)
+        SELECT 'market', market_id, NULL, {aggregates}
+        FROM products {market_filter}
+        GROUP BY market_id
+        UNION ALL
+        SELECT 'market_category', market_id, category, {aggregates}
+        FROM products {market_filter}
+        GROUP BY market_id, category
+        UNION ALL
+        SELECT 'category', NULL, category, {aggregates}
+        FROM products {category_filter}
+        GROUP BY category
+    """, params)
+
+def _create_month_partitions(cur, dates_query):
+    """Create the monthly price_observations partitions for the dates a query returns."""
+    cur.execute(f"""
+        SELECT DISTINCT date_trunc('month', observed_on)::date
+        FROM ({dates_query}) AS dates (observed_on)
+        WHERE observed_on IS NOT NULL
+    """)
+    for (month_start,) in cur.fetchall():
+        next_month = (month_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        cur.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {} PARTITION OF price_observations
+            FOR VALUES FROM (%s) TO (%s)
+        """).format(sql.Identifier(f"price_observations_{month_start:%Y_%m}")), (month_start, next_month))
+
+def store_scraped_products(products_df, chunk_size=COPY_CHUNK_ROWS):
     """
     Stores scraped products data into the database.
     
+    Products are upserted on their natural key (market, normalized name,
+    unit and description), so storing the same scrape again changes nothing. See upsert_products.
+    
     Parameters:
     -----------
     products_df : pandas.DataFrame
         DataFrame containing product data (name, price, category, market, last_updated)
+    chunk_size : int, optional
+        Rows serialized and copied at a time, bounding the buffer size
     
     Returns:
     --------
@@ -87,77 +501,191 @@ def store_scraped_products(products_df):
         True if storage was successful, False otherwise.
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Ensure tables exist
-        setup_database()
-        
-        # First, make sure all markets exist
-        unique_markets = products_df['market'].unique()
-        
-        for market in unique_markets:
-            # Check if market exists
-            cur.execute("SELECT id FROM markets WHERE name = %s", (market,))
-            market_id = cur.fetchone()
-            
-            # If market doesn't exist, create it
-            if not market_id:
-                cur.execute(
-                    "INSERT INTO markets (name) VALUES (%s) RETURNING id",
-                    (market,)
-                )
-                market_id = cur.fetchone()
-            
-            # Get the market ID integer
-            market_id_value = market_id[0] if market_id else None
-            
-            # Add products for this market
-            market_products = products_df[products_df['market'] == market]
-            
-            # Prepare batch insert
-            product_data = []
-            for _, row in market_products.iterrows():
-                # Handle the new KAM fields if they exist
-                product_data.append((
-                    row['name'],
-                    row['price'],
-                    row.get('unit_price', None),
-                    row.get('category', 'Uncategorized'),
-                    market_id_value,
-                    row.get('image_url', None),
-                    row.get('description', None),
-                    row.get('availability', None),
-                    row.get('regular_price', None),
-                    row.get('discounted_price', None),
-                    row.get('discount_percent', None),
-                    row.get('discount_type', None),
-                    row.get('discount_period', None),
-                    row.get('last_updated', None),
-                    row.get('source_document', None)
-                ))
-            
-            # Insert products with the new schema
-            execute_values(
-                cur,
-                """
-                INSERT INTO products 
-                (name, price, unit_price, category, market_id, image_url, description, 
-                availability, regular_price, discounted_price, discount_percent, 
-                discount_type, discount_period, last_updated, source_document)
-                VALUES %s
-                """,
-                product_data
-            )
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        counts = upsert_products(products_df, chunk_size)
+        print(f"Stored products: {counts['inserted']} inserted, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged")
+        if counts['duplicates']:
+            print(f"Skipped {counts['duplicates']} rows with the same market, name, unit and "
+                  f"description as a later row; only the last one is stored")
         return True
     except Exception as e:
         print(f"Error storing products: {e}")
         return False
 
+def upsert_products(products_df, chunk_size=COPY_CHUNK_ROWS):
+    """
+    Insert new products and update the ones whose price fields changed.
+    
+    Market names are mapped to ids from a process-wide cache; only markets
+    not seen before cost a round trip, one upsert for all of them. The
+    products are written column-wise as CSV into memory and loaded with
+    COPY into a temporary staging table, and all products are merged with
+    one INSERT ... ON CONFLICT on the natural key. A product already stored with the same price fields is not written.
+    When the same key appears more than once, the last row wins.
+    
+    Parameters:
+    -----------
+    products_df : pandas.DataFrame
+        DataFrame containing product data (name, price, category, market, last_updated)
+    chunk_size : int, optional
+        Rows serialized and copied at a time, bounding the buffer size
+    
+    Returns:
+    --------
+    dict
+        Number of products inserted, updated and unchanged, and of rows
+        skipped as duplicates (same natural key as a later row)
+    """
+    try:
+        with db_connection() as conn, conn.cursor() as cur:
+            # Ensure tables exist, on the same connection and transaction
+            _create_tables(cur)
+            
+            market_names = products_df['market'].dropna().unique() if 'market' in products_df.columns else []
+            market_ids, new_market_ids = _resolve_market_ids(cur, market_names)
+            staging_df = _to_staging_frame(products_df, market_ids)
+            counts = _merge_staged_products(cur, staging_df, chunk_size)
+            
+            if counts['inserted'] or counts['updated']:
+                _refresh_loaded_price_stats(cur, list(market_ids.values()))
+    except Exception:
+        # A cached id may be why the load failed, e.g. after the markets table was recreated
+        clear_market_cache()
+        raise
+    
+    # Markets inserted by the load only exist once it is committed
+    with _market_ids_lock:
+        _market_ids.update(new_market_ids)
+    return counts
+
+def clear_market_cache():
+    """Forget the cached market ids, so they are looked up again."""
+    with _market_ids_lock:
+        _market_ids.clear()
+
+def _resolve_market_ids(cur, market_names):
+    """
+    Map market names to ids, inserting the markets that don't exist yet.
+    
+    Names missing from the process-wide cache are resolved with one upsert.
+    
+    Returns:
+    --------
+    tuple
+        (dict of every name to its id, dict of the names that were not cached)
+    """
+    with _market_ids_lock:
+        market_ids = {name: _market_ids[name] for name in market_names if name in _market_ids}
+    missing = [str(name) for name in market_names if name not in market_ids]
+    
+    new_market_ids = {}
+    if missing:
+        # DO UPDATE instead of DO NOTHING so existing markets also return their id
+        cur.execute("""
+            INSERT INTO markets (name)
+            SELECT unnest(%s::varchar[])
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING name, id
+        """, (missing,))
+        new_market_ids = dict(cur.fetchall())
+    
+    return {**market_ids, **new_market_ids}, new_market_ids
+
+def _refresh_loaded_price_stats(cur, market_ids):
+    """Recompute the price aggregates a load into the staging table may have changed."""
+    # A product moved to another category also changes the aggregates of its
+    # old category, which the market/category aggregates still list
+    cur.execute("""
+        SELECT DISTINCT category FROM products_staging
+        UNION
+        SELECT category FROM product_price_stats
+        WHERE grouped_by = 'market_category' AND market_id = ANY(%s)
+    """, (market_ids,))
+    categories = [row[0] for row in cur.fetchall()]
+    refresh_price_stats(cur, market_ids, categories)
+
+def _merge_staged_products(cur, staging_df, chunk_size):
+    """Copy the staging rows into the database and upsert them into products."""
+    # Dropped automatically when the transaction ends
+    cur.execute(f"""
+        CREATE TEMP TABLE products_staging (
+            {', '.join(f'{column} {column_type}' for column, column_type in STAGING_COLUMNS.items())}
+        ) ON COMMIT DROP
+    """)
+    
+    copy_sql = f"COPY products_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    for start in range(0, len(staging_df), chunk_size):
+        buffer = io.StringIO()
+        staging_df.iloc[start:start + chunk_size].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cur.copy_expert(copy_sql, buffer)
+    
+    _create_month_partitions(cur, "SELECT coalesce(last_updated, CURRENT_DATE) FROM products_staging")
+    
+    # xmax is 0 only for rows inserted by this statement. Every inserted
+    # or changed product is also recorded in the price history.
+    staged_key = ', '.join([
+        's.market_id',
+        NAME_KEY_SQL.format('s.name'),
+        UNIT_KEY_SQL.format('s.unit_price'),
+        DESCRIPTION_KEY_SQL.format('s.description')
+    ])
+    cur.execute(f"""
+        WITH valid AS (
+            SELECT * FROM products_staging s
+            -- Rows without a name, price or market can't be stored
+            WHERE s.name IS NOT NULL AND s.price IS NOT NULL AND s.market_id IS NOT NULL
+        ), staged AS (
+            SELECT DISTINCT ON ({staged_key})
+                {', '.join(f's.{column}' for column in PRODUCT_COLUMNS)}
+            FROM valid s
+            ORDER BY {staged_key}, s.row_index DESC
+        ), upserted AS (
+            INSERT INTO products AS p ({', '.join(PRODUCT_COLUMNS)})
+            SELECT {', '.join(PRODUCT_COLUMNS)} FROM staged
+            ON CONFLICT ({', '.join(NATURAL_KEY_COLUMNS)}) DO UPDATE SET
+                {', '.join(f'{column} = EXCLUDED.{column}' for column in PRODUCT_COLUMNS if column != 'market_id')}
+            WHERE ({', '.join(f'p.{column}' for column in PRICE_COLUMNS)})
+                IS DISTINCT FROM ({', '.join(f'EXCLUDED.{column}' for column in PRICE_COLUMNS)})
+            RETURNING p.*, (xmax = 0) AS inserted
+        ), observed AS (
+            INSERT INTO price_observations ({', '.join(OBSERVATION_COLUMNS)})
+            SELECT id, market_id, coalesce(last_updated, CURRENT_DATE),
+                   {', '.join(OBSERVATION_COLUMNS[3:])}
+            FROM upserted
+        )
+        SELECT
+            (SELECT count(*) FROM valid),
+            (SELECT count(*) FROM staged),
+            count(*) FILTER (WHERE inserted),
+            count(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+    """)
+    valid, staged, inserted, updated = cur.fetchone()
+    
+    return {
+        'inserted': inserted,
+        'updated': updated,
+        'unchanged': staged - inserted - updated,
+        'duplicates': valid - staged
+    }
+
+def _to_staging_frame(products_df, market_ids):
+    """Select the staging columns of a products DataFrame, adding missing ones."""
+    staging_df = pd.DataFrame(index=products_df.index)
+    for column in STAGING_COLUMNS:
+        if column == 'row_index':
+            staging_df[column] = range(len(products_df))
+        elif column == 'market_id':
+            # One vectorized lookup of every row's market
+            markets = products_df['market'] if 'market' in products_df.columns else pd.Series(None, index=products_df.index)
+            staging_df[column] = markets.map(market_ids).astype('Int64')
+        elif column in products_df.columns:
+            staging_df[column] = products_df[column]
+        else:
+            staging_df[column] = 'Uncategorized' if column == 'category' else None
+    return staging_df
+
 def get_products_from_db():
     """
     Retrieves all products from the database.
@@ -168,10 +696,260 @@ def get_products_from_db():
         DataFrame containing product data joined with market data.
     """
     try:
-        conn = get_db_connection()
+        # Concatenating all batches at once would hold every batch next to the
+        # whole result, so the result is built one column at a time, releasing
+        # that column's batches as it goes
+        chunks = {}
+        rows = 0
+        for batch in iter_products():
+            rows += len(batch)
+            for column in batch.columns:
+                chunks.setdefault(column, []).append(batch[column])
+        if not chunks:
+            return pd.DataFrame()
         
-        # Query to join products and markets with all KAM fields
-        query = """
+        df = pd.DataFrame(index=pd.RangeIndex(rows))
+        for column in list(chunks):
+            df[column] = pd.concat(chunks.pop(column), ignore_index=True)
+        return df
+    except Exception as e:
+        print(f"Error retrieving products: {e}")
+        return pd.DataFrame()
+
+def iter_products(batch_size=DB_FETCH_SIZE, as_arrow=False):
+    """
+    Iterates over all products in batches, see iter_query_batches.
+    
+    Parameters:
+    -----------
+    batch_size : int, optional
+        Number of products per batch
+    as_arrow : bool, optional
+        Yield pyarrow.RecordBatch instead of DataFrame batches
+    
+    Yields:
+    -------
+    pandas.DataFrame or pyarrow.RecordBatch
+        Products joined with market data
+    """
+    # Query to join products and markets with all KAM fields
+    query = """
+        SELECT 
+            p.id, p.name, p.price, p.unit_price, p.category, 
+            m.name as market, p.image_url, p.description, 
+            p.availability, p.regular_price, p.discounted_price, 
+            p.discount_percent, p.discount_type, p.discount_period,
+            p.last_updated, p.source_document
+        FROM 
+            products p
+        JOIN 
+            markets m ON p.market_id = m.id
+    """
+    return iter_query_batches(query, batch_size=batch_size, as_arrow=as_arrow)
+
+def iter_price_observations(start_date=None, end_date=None, batch_size=DB_FETCH_SIZE, as_arrow=False):
+    """
+    Iterates over the price history in batches, oldest first.
+    
+    Parameters:
+    -----------
+    start_date, end_date : str or datetime.date, optional
+        First and last day of the observations (inclusive)
+    batch_size : int, optional
+        Number of observations per batch
+    as_arrow : bool, optional
+        Yield pyarrow.RecordBatch instead of DataFrame batches
+    
+    Yields:
+    -------
+    pandas.DataFrame or pyarrow.RecordBatch
+        Observations with the product name, unit and market name; the price
+        of every product on start_date is included, dated start_date
+    """
+    query = f"""
+        SELECT 
+            o.observed_on, o.product_id, p.name, p.unit_key as unit, m.name as market,
+            o.price, o.regular_price, o.discounted_price, o.discount_percent,
+            o.discount_type, o.discount_period, o.source_document
+        FROM 
+            ({_observations_in_range_sql(start_date, end_date)}) o
+        JOIN 
+            products p ON p.id = o.product_id
+        JOIN 
+            markets m ON m.id = o.market_id
+        ORDER BY 
+            o.observed_on
+    """
+    params = {'start_date': start_date, 'end_date': end_date}
+    return iter_query_batches(query, params, batch_size, as_arrow)
+
+def _observations_in_range_sql(start_date=None, end_date=None, product_ids_sql=None):
+    """
+    SQL selecting the price observations in effect during a date range.
+    
+    Only price changes are stored, so the last observation of every product
+    on or before start_date is selected, dated start_date, followed by the
+    observations after it. The last observation is found per product with
+    one index probe, so the partitions before the range are not read. Otherwise a product whose price did not
+    change during the range would have no observations.
+    
+    Parameters:
+    -----------
+    start_date, end_date : str or datetime.date, optional
+        Passed as the start_date and end_date query parameters when given
+    product_ids_sql : str, optional
+        Query of the ids of the only products to select
+    """
+    columns = ', '.join(OBSERVATION_COLUMNS)
+    conditions = []
+    if start_date is not None:
+        # The observation on start_date itself is the one carried below
+        conditions.append("observed_on > %(start_date)s")
+    if end_date is not None:
+        conditions.append("observed_on <= %(end_date)s")
+    if product_ids_sql is not None:
+        conditions.append(f"product_id IN ({product_ids_sql})")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    query = f"SELECT {columns} FROM price_observations {where}"
+    if start_date is None:
+        return query
+    
+    # Looked up per product as the newest observation by the
+    # price_observations_product index, instead of reading every
+    # observation before start_date
+    carried_conditions = []
+    if end_date is not None:
+        carried_conditions.append("%(start_date)s::date <= %(end_date)s::date")
+    if product_ids_sql is not None:
+        carried_conditions.append(f"p.id IN ({product_ids_sql})")
+    carried_where = f"WHERE {' AND '.join(carried_conditions)}" if carried_conditions else ""
+    carried_columns = ', '.join(
+        "%(start_date)s::date AS observed_on" if column == 'observed_on' else f"carried.{column}"
+        for column in OBSERVATION_COLUMNS
+    )
+    
+    return f"""
+        {query}
+        UNION ALL
+        SELECT {carried_columns}
+        FROM products p
+        CROSS JOIN LATERAL (
+            SELECT {columns}
+            FROM price_observations
+            WHERE product_id = p.id AND observed_on <= %(start_date)s
+            ORDER BY observed_on DESC
+            LIMIT 1
+        ) carried
+        {carried_where}
+    """
+
+def iter_query_batches(query, params=None, batch_size=DB_FETCH_SIZE, as_arrow=False):
+    """
+    Runs a query with a named server-side cursor and yields the result in batches.
+    
+    The result set stays on the server and batch_size rows are fetched per
+    round trip, so memory use is bounded by one batch however large the
+    result is. Every batch has the same column types: ids are Int64, prices
+    float64 and dates datetime.date, with text and unknown columns as objects.
+    The pooled connection is held until the iteration ends.
+    
+    Parameters:
+    -----------
+    query : str
+        SELECT statement
+    params : dict or tuple, optional
+        Query parameters
+    batch_size : int, optional
+        Number of rows per batch (default: DB_FETCH_SIZE)
+    as_arrow : bool, optional
+        Yield pyarrow.RecordBatch instead of DataFrame batches (requires pyarrow)
+    
+    Yields:
+    -------
+    pandas.DataFrame or pyarrow.RecordBatch
+        The next batch_size rows of the result
+    """
+    if as_arrow:
+        import pyarrow as pa
+    
+    with db_connection() as conn:
+        with conn.cursor(name=f"batches_{uuid.uuid4().hex}") as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            schema = None
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                # A named cursor only describes its columns after the first fetch
+                columns = [column[0] for column in cur.description]
+                batch = _typed_batch(rows, columns)
+                if as_arrow:
+                    if schema is None:
+                        schema = pa.schema([(column, _arrow_type(pa, column)) for column in columns])
+                    yield pa.RecordBatch.from_pandas(batch, schema=schema, preserve_index=False)
+                else:
+                    yield batch
+
+def _typed_batch(rows, columns):
+    """Build a DataFrame from fetched rows with the same column types in every batch."""
+    batch = pd.DataFrame.from_records(rows, columns=columns)
+    for column in columns:
+        column_type = COLUMN_TYPES.get(column)
+        if column_type == 'int':
+            batch[column] = batch[column].astype('Int64')
+        elif column_type == 'float':
+            # NUMERIC columns arrive as Decimal
+            batch[column] = batch[column].astype('float64')
+        else:
+            batch[column] = batch[column].astype(object)
+    return batch
+
+def _arrow_type(pa, column):
+    column_type = COLUMN_TYPES.get(column)
+    if column_type == 'int':
+        return pa.int64()
+    if column_type == 'float':
+        return pa.float64()
+    if column_type == 'date':
+        return pa.date32()
+    return pa.string()
+
+def query_products(search=None, category=None, markets=None, min_price=None, max_price=None, limit=None, offset=0):
+    """
+    Retrieves one page of the products matching the filters.
+    
+    All filtering, sorting and paging happens in the database, so only the
+    rows of the requested page are transferred. The number of matching
+    products is counted separately by count_products.
+    
+    Parameters:
+    -----------
+    search : str, optional
+        Text contained in the product name, category or market (case-insensitive)
+    category : str, optional
+        Category to filter by
+    markets : list, optional
+        List of markets to include
+    min_price : float, optional
+        Minimum price
+    max_price : float, optional
+        Maximum price
+    limit : int, optional
+        Maximum number of products to return (default: all)
+    offset : int, optional
+        Number of matching products to skip, for paging
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        The products ordered by name
+    """
+    try:
+        where, params = _product_filters_sql(search, category, markets, min_price, max_price)
+        params.update({'limit': limit, 'offset': offset})
+        query = f"""
             SELECT 
                 p.id, p.name, p.price, p.unit_price, p.category, 
                 m.name as market, p.image_url, p.description, 
@@ -182,12 +960,217 @@ def get_products_from_db():
                 products p
             JOIN 
                 markets m ON p.market_id = m.id
+            {where}
+            ORDER BY 
+                p.name, p.id
+            LIMIT %(limit)s OFFSET %(offset)s
         """
         
-        # Read the data into a DataFrame
-        df = pd.read_sql(query, conn)
-        conn.close()
+        with db_connection() as conn:
+            df = pd.read_sql(query, conn, params=params)
         return df
     except Exception as e:
-        print(f"Error retrieving products: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        print(f"Error querying products: {e}")
+        return pd.DataFrame()
+
+def count_products(search=None, category=None, markets=None, min_price=None, max_price=None):
+    """
+    Counts the products matching the filters of query_products.
+    
+    Counting reads every matching row, so callers should count once per
+    change of the filters rather than once per page.
+    
+    Returns:
+    --------
+    int
+        Number of matching products
+    """
+    try:
+        where, params = _product_filters_sql(search, category, markets, min_price, max_price)
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT count(*)
+                FROM products p
+                JOIN markets m ON p.market_id = m.id
+                {where}
+            """, params)
+            return cur.fetchone()[0]
+    except Exception as e:
+        print(f"Error counting products: {e}")
+        return 0
+
+def _product_filters_sql(search=None, category=None, markets=None, min_price=None, max_price=None):
+    """Build the WHERE clause and parameters of the product filters, over products p joined to markets m."""
+    conditions = []
+    params = {}
+    
+    if search:
+        # Escape LIKE wildcards so the text is matched literally
+        pattern = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params['search'] = f"%{pattern}%"
+        # Matching markets by id keeps every branch on an indexed products column
+        conditions.append("""(
+            p.name ILIKE %(search)s
+            OR p.category ILIKE %(search)s
+            OR p.market_id IN (SELECT id FROM markets WHERE name ILIKE %(search)s)
+        )""")
+    if category is not None:
+        conditions.append("p.category = %(category)s")
+        params['category'] = category
+    if markets is not None and len(markets) > 0:
+        conditions.append("m.name = ANY(%(markets)s)")
+        params['markets'] = list(markets)
+    if min_price is not None:
+        conditions.append("p.price >= %(min_price)s")
+        params['min_price'] = min_price
+    if max_price is not None:
+        conditions.append("p.price <= %(max_price)s")
+        params['max_price'] = max_price
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def get_product_filter_options():
+    """
+    Retrieves the values available for the product filters.
+    
+    Returns:
+    --------
+    dict
+        categories (list), markets (list), has_products (whether any
+        product is stored) and version (changes whenever a store changes
+        products, so counts of matching products can be kept until then)
+    """
+    try:
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT category FROM products WHERE category IS NOT NULL ORDER BY category")
+            categories = [row[0] for row in cur.fetchall()]
+            cur.execute("SELECT name FROM markets WHERE id IN (SELECT DISTINCT market_id FROM products) ORDER BY name")
+            markets = [row[0] for row in cur.fetchall()]
+            cur.execute("SELECT EXISTS (SELECT 1 FROM products)")
+            has_products = cur.fetchone()[0]
+            # Every store that inserts or updates products refreshes the
+            # price aggregates, in the scrape daemon as well as here
+            cur.execute("SELECT max(refreshed_at) FROM product_price_stats")
+            version = cur.fetchone()[0]
+        return {'categories': categories, 'markets': markets, 'has_products': has_products, 'version': version}
+    except Exception as e:
+        print(f"Error retrieving filter options: {e}")
+        return {'categories': [], 'markets': [], 'has_products': False, 'version': None}
+
+def get_price_stats(grouped_by='market', category=None):
+    """
+    Retrieves precomputed price aggregates.
+    
+    Parameters:
+    -----------
+    grouped_by : str, optional
+        'market' for one row per market, 'category' for one row per
+        category, or 'market_category' for one row per market and category
+    category : str, optional
+        Only the aggregates of this category (with grouped_by 'category' or
+        'market_category')
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        market, category, product_count, mean_price, median_price, min_price,
+        max_price and refreshed_at of every group
+    """
+    try:
+        conditions = ["s.grouped_by = %(grouped_by)s"]
+        if category is not None:
+            conditions.append("s.category = %(category)s")
+        
+        query = f"""
+            SELECT 
+                m.name as market, s.category, s.product_count,
+                s.mean_price::float AS mean_price, s.median_price::float AS median_price,
+                s.min_price::float AS min_price, s.max_price::float AS max_price,
+                s.refreshed_at
+            FROM 
+                product_price_stats s
+            LEFT JOIN 
+                markets m ON m.id = s.market_id
+            WHERE 
+                {' AND '.join(conditions)}
+            ORDER BY 
+                m.name, s.category
+        """
+        
+        with db_connection() as conn:
+            df = pd.read_sql(query, conn, params={'grouped_by': grouped_by, 'category': category})
+        return df
+    except Exception as e:
+        print(f"Error retrieving price statistics: {e}")
+        return pd.DataFrame()
+
+def get_price_series(product_name, market=None, start_date=None, end_date=None, unit=None):
+    """
+    Retrieves the price history of a product.
+    
+    The name is matched on the normalized natural key, so case and spacing
+    don't matter. The date range only reads the monthly partitions it covers.
+    
+    Parameters:
+    -----------
+    product_name : str
+        Name of the product
+    market : str, optional
+        Only the prices in this market
+    start_date, end_date : str or datetime.date, optional
+        First and last day of the series (inclusive)
+    unit : str, optional
+        Only the product with this unit, like '100 гр'
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per price change (observed_on, market, name, unit, price,
+        regular_price, discounted_price, discount_percent, discount_type,
+        discount_period, source_document), ordered by market and date. With
+        start_date, the price in effect on that day is the first row.
+    """
+    try:
+        conditions = [f"p.name_key = {NAME_KEY_SQL.format('%(name)s')}"]
+        if market is not None:
+            conditions.append("m.name = %(market)s")
+        if unit is not None:
+            # Normalized like a unit price, which has the unit before '='
+            unit_key = UNIT_KEY_SQL.format("%(unit)s || '='")
+            conditions.append(f"p.unit_key = {unit_key}")
+        
+        # The products are selected first, so only their observations are read
+        product_ids_sql = f"""
+            SELECT p.id FROM products p JOIN markets m ON m.id = p.market_id
+            WHERE {' AND '.join(conditions)}
+        """
+        
+        query = f"""
+            SELECT 
+                o.observed_on, m.name as market, p.name, p.unit_key as unit,
+                o.price, o.regular_price, o.discounted_price, o.discount_percent,
+                o.discount_type, o.discount_period, o.source_document
+            FROM 
+                ({_observations_in_range_sql(start_date, end_date, product_ids_sql)}) o
+            JOIN 
+                products p ON p.id = o.product_id
+            JOIN 
+                markets m ON m.id = o.market_id
+            ORDER BY 
+                m.name, p.unit_key, o.observed_on
+        """
+        params = {
+            'name': product_name,
+            'market': market,
+            'unit': unit,
+            'start_date': start_date,
+            'end_date': end_date
+        }
+        
+        with db_connection() as conn:
+            df = pd.read_sql(query, conn, params=params)
+        return df
+    except Exception as e:
+        print(f"Error retrieving price series: {e}")
+        return pd.DataFrame()
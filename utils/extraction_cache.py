@@ -0,0 +1,156 @@
+import os
+import inspect
+import hashlib
+import pandas as pd
+from utils.atomic_write import write_atomic
+
+try:
+    import pyarrow  # noqa: F401 - only needed for the Parquet cache format
+    CACHE_FORMAT = 'parquet'
+except ImportError:
+    CACHE_FORMAT = 'pickle'
+
+DEFAULT_CACHE_DIR = os.getenv('EXTRACTION_CACHE_DIR', os.path.join('data', 'cache'))
+DEFAULT_MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+# Extractor arguments that only change how the extraction runs, not its
+# result, so they are left out of the cache key
+EXECUTION_KWARGS = frozenset({'workers'})
+
+def hash_pdf_content(pdf_path):
+    """
+    Compute the SHA-256 hash of a PDF file's content.
+
+    Parameters:
+    -----------
+    pdf_path : str
+        Path to the PDF file
+
+    Returns:
+    --------
+    str
+        Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cached_extraction(pdf_path, extract_func, extractor_version, cache_dir=None, max_cache_bytes=DEFAULT_MAX_CACHE_BYTES, **kwargs):
+    """
+    Run a PDF extractor, reusing the stored result when the same file was extracted before.
+
+    Results are keyed by the PDF content hash, the extractor name and its
+    version, and the extractor arguments that affect its output, so
+    re-uploading an identical price list skips the extraction and bumping
+    the extractor version invalidates old entries.
+
+    Parameters:
+    -----------
+    pdf_path : str
+        Path to the PDF file
+    extract_func : callable
+        Extractor taking the PDF path and returning a DataFrame
+    extractor_version : str
+        Version of the extractor's parsing logic
+    cache_dir : str, optional
+        Directory holding the cache files (default: EXTRACTION_CACHE_DIR or data/cache)
+    max_cache_bytes : int, optional
+        Size limit of the cache directory; least recently used entries are evicted
+    **kwargs
+        Extra keyword arguments passed to extract_func on a cache miss
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Extracted product data
+    """
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    key = f"{extract_func.__name__}-{extractor_version}-{_hash_arguments(extract_func, pdf_path, kwargs)}-{hash_pdf_content(pdf_path)}"
+    cache_path = os.path.join(cache_dir, f"{key}.{CACHE_FORMAT}")
+
+    if os.path.exists(cache_path):
+        try:
+            df = _read_cache_file(cache_path)
+            # Mark the entry as recently used for LRU eviction
+            os.utime(cache_path)
+            return df
+        except Exception as e:
+            print(f"Error reading extraction cache, extracting again: {e}")
+
+    df = extract_func(pdf_path, **kwargs)
+
+    # Extractors return an empty frame on failure, so don't cache those
+    if df is not None and not df.empty:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            _write_cache_file(df, cache_path)
+            evict_cache(cache_dir, max_cache_bytes)
+        except Exception as e:
+            print(f"Error writing extraction cache: {e}")
+
+    return df
+
+def evict_cache(cache_dir=None, max_cache_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """
+    Remove the least recently used cache files until the cache fits the size limit.
+
+    Parameters:
+    -----------
+    cache_dir : str, optional
+        Directory holding the cache files
+    max_cache_bytes : int, optional
+        Maximum total size of the cache files
+
+    Returns:
+    --------
+    int
+        Number of files removed
+    """
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and entry.name.endswith(('.parquet', '.pickle')):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_size = sum(size for _, size, _ in entries)
+    removed = 0
+    # Oldest access time first
+    for _, size, path in sorted(entries):
+        if total_size <= max_cache_bytes:
+            break
+        os.remove(path)
+        total_size -= size
+        removed += 1
+
+    return removed
+
+def _hash_arguments(extract_func, pdf_path, kwargs):
+    """Hash the arguments of an extractor call that affect its output, defaults included."""
+    # Defaults are filled in, so passing a default explicitly or leaving it
+    # out gives the same key
+    bound = inspect.signature(extract_func).bind(pdf_path, **kwargs)
+    bound.apply_defaults()
+    arguments = sorted(
+        (name, value) for name, value in list(bound.arguments.items())[1:]
+        if name not in EXECUTION_KWARGS
+    )
+    return hashlib.sha256(repr(arguments).encode('utf-8')).hexdigest()[:12]
+
+def _read_cache_file(cache_path):
+    if cache_path.endswith('.parquet'):
+        return pd.read_parquet(cache_path)
+    return pd.read_pickle(cache_path)
+
+def _write_cache_file(df, cache_path):
+    def write(tmp_path):
+        if cache_path.endswith('.parquet'):
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.reset_index(drop=True).to_pickle(tmp_path)
+    write_atomic(cache_path, write)
@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import hashlib
+import requests
+from datetime import datetime
+from urllib.parse import urlsplit
+from utils.atomic_write import write_atomic
+
+DEFAULT_HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', os.path.join('data', 'cache', 'http'))
+
+# Recorded responses used to run the scrapers offline. With HTTP_FIXTURE_MODE
+# set to 'record' every fetched page is also saved as a fixture, with 'replay'
+# pages are only read from the fixtures and the network is never used.
+DEFAULT_FIXTURE_DIR = os.getenv('HTTP_FIXTURE_DIR', os.path.join('data', 'fixtures', 'http'))
+HTTP_FIXTURE_MODE = os.getenv('HTTP_FIXTURE_MODE')
+FIXTURE_MODES = ('record', 'replay')
+
+def fetch_page(url, session=None, timeout=30, mode=None, fixture_dir=None):
+    """
+    Fetch a page through the HTTP cache, recording or replaying fixtures.
+
+    Parameters:
+    -----------
+    url : str
+        Address of the page
+    session : requests.Session, optional
+        Session used for the request, to reuse pooled connections
+    timeout : float, optional
+        Request timeout in seconds
+    mode : str, optional
+        'record', 'replay' or None to just fetch (default: HTTP_FIXTURE_MODE)
+    fixture_dir : str, optional
+        Directory holding the fixtures (default: HTTP_FIXTURE_DIR or data/fixtures/http)
+
+    Returns:
+    --------
+    str
+        Decoded body of the page
+
+    Raises:
+    -------
+    FileNotFoundError
+        If replaying and no fixture was recorded for the URL
+    """
+    mode = mode or HTTP_FIXTURE_MODE
+    if mode and mode not in FIXTURE_MODES:
+        raise ValueError(f"Unknown fixture mode: {mode}")
+
+    if mode == 'replay':
+        return load_fixture(url, fixture_dir)
+
+    text = fetch_cached(url, session, timeout=timeout)
+    if mode == 'record':
+        save_fixture(url, text, fixture_dir)
+    return text
+
+def fixture_path(url, fixture_dir=None):
+    """Return the path of the fixture file recorded for a URL."""
+    fixture_dir = fixture_dir or DEFAULT_FIXTURE_DIR
+    parts = urlsplit(url)
+    # Named after the host so the recorded files are easy to tell apart
+    slug = re.sub(r'[^\w.-]+', '_', parts.netloc).strip('_') or 'page'
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(fixture_dir, f"{slug}-{key}.json")
+
+def save_fixture(url, text, fixture_dir=None):
+    """
+    Record the body of a page as a fixture.
+
+    Returns:
+    --------
+    str
+        Path of the fixture file
+    """
+    path = fixture_path(url, fixture_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_atomic(path, _write_bytes(json.dumps({
+        'url': url,
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'text': text
+    }, ensure_ascii=False, indent=1).encode('utf-8')))
+    return path
+
+def load_fixture(url, fixture_dir=None):
+    """Return the recorded body of a page, raising FileNotFoundError if it was never recorded."""
+    path = fixture_path(url, fixture_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No fixture recorded for {url} ({path})")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['text']
+
+def fetch_cached(url, session=None, cache_dir=None, timeout=30):
+    """
+    Fetch a page, revalidating a locally cached copy instead of downloading it again.
+
+    When the page was fetched before with an ETag or Last-Modified header,
+    the request is sent with If-None-Match / If-Modified-Since and the cached
+    body is reused when the server answers 304 Not Modified.
+
+    Parameters:
+    -----------
+    url : str
+        Address of the page
+    session : requests.Session, optional
+        Session used for the request, to reuse pooled connections
+    cache_dir : str, optional
+        Directory holding the cached responses (default: HTTP_CACHE_DIR or data/cache/http)
+    timeout : float, optional
+        Request timeout in seconds
+
+    Returns:
+    --------
+    str
+        Decoded body of the page
+
+    Raises:
+    -------
+    requests.HTTPError
+        If the server answers with an error status
+    """
+    cache_dir = cache_dir or DEFAULT_HTTP_CACHE_DIR
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    meta_path = os.path.join(cache_dir, f"{key}.json")
+    body_path = os.path.join(cache_dir, f"{key}.body")
+
+    meta = _read_meta(meta_path, body_path)
+    headers = {}
+    if meta:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    response = (session or requests).get(url, headers=headers, timeout=timeout)
+
+    if response.status_code == 304 and meta:
+        with open(body_path, 'rb') as f:
+            return f.read().decode(meta.get('encoding') or 'utf-8', errors='replace')
+
+    response.raise_for_status()
+    text = response.text
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    # Without validators the page can't be revalidated, so there is nothing to cache
+    if etag or last_modified:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # The body goes first so the metadata never points to a missing body
+            write_atomic(body_path, _write_bytes(response.content))
+            write_atomic(meta_path, _write_bytes(json.dumps({
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'encoding': response.encoding
+            }).encode('utf-8')))
+        except OSError as e:
+            print(f"Error writing HTTP cache for {url}: {e}")
+
+    return text
+
+def _read_meta(meta_path, body_path):
+    """Load the cache metadata of a page, or None if there is no usable entry."""
+    if not os.path.exists(meta_path) or not os.path.exists(body_path):
+        return None
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_bytes(data):
+    """Return a writer of data for write_atomic."""
+    def write(path):
+        with open(path, 'wb') as f:
+            f.write(data)
+    return write
@@ -1,9 +1,93 @@
 import pandas as pd
 import re
+import os
+import json
+import bisect
+import hashlib
 import pdfplumber
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from pdfminer.pdftypes import resolve1
+from utils.atomic_write import write_atomic
+from utils.category_classifier import compile_category_keywords, classify_name, classify_names
 
-def extract_kam_prices_from_pdf(pdf_path):
+# Bump when the parsing logic changes so cached extractions are invalidated
+KAM_EXTRACTOR_VERSION = "1"
+
+# Extraction modes of extract_kam_prices_from_pdf
+KAM_MODES = ('text', 'table')
+
+# Default location of the page fingerprints used by incremental extraction
+KAM_PAGE_STATE_PATH = os.path.join('data', 'cache', 'kam_pages.json')
+
+# A price cell such as "23ден." or "1.179ден." with a thousands separator
+PRICE_PATTERN = re.compile(r'(\d{1,3}(?:\.\d{3})+|\d+)ден\.')
+
+# Columns of the extracted KAM data, in output order
+KAM_COLUMNS = [
+    'name', 'price', 'unit_price', 'description', 'availability',
+    'regular_price', 'discounted_price', 'discount_percent', 'discount_type',
+    'discount_period', 'category', 'market', 'last_updated'
+]
+
+# A KAM product line: name, price, unit price, description, availability,
+# regular price and the optional discount columns. The pattern is searched for
+# the price, which splits the name from the rest of the line; each field after
+# it is looked up independently from that point with a lookahead, so the whole
+# line is parsed by a single search.
+KAM_LINE_PATTERN = re.compile(
+    r'(?P<price>\d+)ден\.'
+    # Unit price (e.g. "100 гр = 9.2"), followed by the description up to the first "Да"
+    r'(?=(?:.*?(?P<unit_price>\d+ гр = [\d.]+)(?:(?P<description>[^Д]*(?:Д(?!а)[^Д]*)*)Да)?)?)'
+    # Regular price after the availability column
+    r'(?=(?:.*?Да\s+(?P<regular_price>\d+)ден\.)?)'
+    r'(?=(?:.*?(?i:попуст)\s*\(%\)\s*(?P<discount_percent>\d+))?)'
+    r'(?=(?:.*?(?i:цена со\s+попуст)\s+(?P<discounted_price>\d+))?)'
+)
+
+# First word of each KAM table header cell and the field read from that column
+KAM_TABLE_HEADERS = {
+    'Назив': 'name',
+    'Продажна': 'price',
+    'Единична': 'unit_price',
+    'Опис': 'description',
+    'Достапност': 'availability',
+    'Редовна': 'regular_price',
+    'Цена': 'discounted_price',
+    'Вид': 'discount_type',
+    'Времетраење': 'discount_period'
+}
+
+# Header labels are inset from the column rule by a few points; column
+# boundaries are placed this far left of each label
+KAM_COLUMN_PADDING = 2
+
+# Cells start slightly above the price that anchors their row
+KAM_ROW_TOLERANCE = 3
+
+# Category keywords, checked in order against the lowercased product name
+KAM_CATEGORY_KEYWORDS = {
+    'Хлеб и пекарски производи': ['леб', 'кифл', 'пекар', 'тост', 'брускет', 'пченкар'],
+    'Слатки и бонбони': ['чокол', 'бонбон', 'желе', 'торт', 'крем', 'слатк', 'какао'],
+    'Житарки и мусли': ['житарк', 'мусли', 'корнфлекс'],
+    'Тестенини': ['фиде', 'тестен'],
+    'Месо и месни производи': ['месо', 'колбас', 'салам', 'пршут', 'сувомес'],
+    'Млеко и млечни производи': ['млеко', 'јогурт', 'сирењ', 'кашкав', 'павлак'],
+    'Овошје и зеленчук': ['овошј', 'зеленчук', 'јаболк', 'домат', 'пипер'],
+    'Пијалоци': ['пијалок', 'сок', 'вода', 'кафе', 'чај'],
+    'Производи за домаќинство': ['средство', 'чист', 'детерг', 'перал', 'сапун', 'шампон'],
+    'Храна за миленици': ['храна за', 'миленич']
+}
+KAM_CATEGORY_CLASSIFIER = compile_category_keywords(KAM_CATEGORY_KEYWORDS)
+
+# Height in points of the page header holding the update date
+KAM_HEADER_BAND = 40
+
+# Text objects in a raw content stream and the y offset of their first text matrix
+TEXT_OBJECT_PATTERN = re.compile(rb'\bBT\b.*?\bET\b', re.S)
+TEXT_MATRIX_PATTERN = re.compile(rb'\S+\s+\S+\s+\S+\s+\S+\s+\S+\s+(-?[\d.]+)\s+Tm\b')
+
+def extract_kam_prices_from_pdf(pdf_path, workers=1, mode='text'):
     """
     Extract product prices from KAM supermarket PDF price list.
     
@@ -11,6 +95,18 @@ def extract_kam_prices_from_pdf(pdf_path):
     -----------
     pdf_path : str
         Path to the PDF file
+    workers : int, optional
+        Number of worker processes used to parse the pages (default: 1).
+        With more than one worker the page range is split into contiguous
+        chunks that are parsed in separate processes and merged back in page
+        order. Pass None to use one worker per CPU core.
+    mode : str, optional
+        'text' (default) parses the layout text of each page line by line.
+        'table' detects the column boundaries on the header page and reads
+        every cell from the character bounding boxes, which keeps product
+        names and descriptions that wrap over several lines and the discount
+        columns that the text mode cannot separate. Any other mode raises
+        ValueError.
         
     Returns:
     --------
@@ -30,141 +126,568 @@ def extract_kam_prices_from_pdf(pdf_path):
         - market: Market name
         - last_updated: Date of price update
     """
+    if mode not in KAM_MODES:
+        raise ValueError(f"Unknown KAM extraction mode: {mode}")
+    
     try:
-        # Market name is KAM
-        market = "KAM"
-        update_date = None
-        products = []
+        if workers is None:
+            workers = os.cpu_count() or 1
         
+        columns = None
         with pdfplumber.open(pdf_path) as pdf:
+            page_count = len(pdf.pages)
             
-            # Process each page
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                
-                if not page_text:
-                    continue
-                
-                # Extract the update date from the first page
-                if update_date is None:
-                    date_match = re.search(r'Датум и време на последно ажурирање на цените: (\d{2}\.\d{2}\.\d{4})', page_text)
-                    if date_match:
-                        date_str = date_match.group(1)
-                        try:
-                            update_date = datetime.strptime(date_str, '%d.%m.%Y').strftime('%Y-%m-%d')
-                        except:
-                            update_date = datetime.now().strftime('%Y-%m-%d')
-                
-                # Split into lines
-                lines = page_text.split('\n')
-                
-                # Skip header lines
-                product_lines = []
-                for i, line in enumerate(lines):
-                    if 'Назив на' in line and 'Продажна' in line:
-                        # Skip header rows (there are usually 7 rows in the header)
-                        product_lines = lines[i+7:]
+            if mode == 'table':
+                # Detect the columns once and reuse them for every page
+                for page in pdf.pages:
+                    columns = detect_kam_columns(page)
+                    page.close()
+                    if columns:
                         break
-                
-                # Current category tracking
-                current_category = "General"
-                
-                # Process the product lines
-                for line in product_lines:
-                    # Skip empty lines and header repetitions
-                    if not line.strip() or 'Назив на' in line or 'Датум и време' in line:
-                        continue
-                    
-                    # Check if this is a product line - they usually start with product name and have prices
-                    # The KAM format has these fields: Name, Price, Unit Price, Description, Availability, Regular Price, Discounted Price
-                    
-                    # Match pattern for product line
-                    # Example: "ЛАЈБИЦИ СЛИБО 23ден. 100 гр = 9.2 ЛАЈБИЦИ ДИЕТ Да 23ден."
-                    # First, let's try to match the price and then extract the name and description
-                    
-                    # Price is usually followed by "ден."
-                    price_match = re.search(r'(\d+)ден\.', line)
-                    if price_match:
-                        # Extract the product name (everything before the price)
-                        line_parts = line.split(price_match.group(0), 1)
-                        if len(line_parts) >= 2:
-                            # Product name is at the beginning of the line
-                            product_name = line_parts[0].strip()
-                            
-                            # Rest of the line contains unit price, description, availability, etc.
-                            rest_of_line = line_parts[1].strip()
-                            
-                            # Extract unit price (e.g., "100 гр = 9.2 ден.")
-                            unit_price_match = re.search(r'(\d+) гр = ([\d\.]+)', rest_of_line)
-                            unit_price = None
-                            if unit_price_match:
-                                unit_price = unit_price_match.group(0)
-                                
-                            # Extract description (after unit price)
-                            description = None
-                            if unit_price and unit_price in rest_of_line:
-                                desc_parts = rest_of_line.split(unit_price, 1)
-                                if len(desc_parts) >= 2:
-                                    # Split by "Да" (availability indicator)
-                                    if "Да" in desc_parts[1]:
-                                        description = desc_parts[1].split("Да")[0].strip()
-                            
-                            # Extract regular price
-                            regular_price_match = re.search(r'Да\s+(\d+)ден\.', rest_of_line)
-                            regular_price = None
-                            if regular_price_match:
-                                regular_price = regular_price_match.group(1)
-                            
-                            # Look for discount price (not all products have it)
-                            discount_price = None
-                            discount_percent = None
-                            discount_type = None
-                            discount_period = None
-                            
-                            # Check if there's any discount information
-                            if "попуст" in rest_of_line.lower():
-                                # Try to find discount information
-                                discount_match = re.search(r'попуст\s*\((%)\)\s*(\d+)', rest_of_line, re.IGNORECASE)
-                                if discount_match:
-                                    discount_percent = discount_match.group(2)
-                                    
-                                # Try to find discounted price
-                                discount_price_match = re.search(r'Цена со\s+попуст\s+(\d+)', rest_of_line, re.IGNORECASE)
-                                if discount_price_match:
-                                    discount_price = discount_price_match.group(1)
-                            
-                            # Add to products list
-                            products.append({
-                                'name': product_name,
-                                'price': price_match.group(1),
-                                'unit_price': unit_price,
-                                'description': description,
-                                'availability': "Да",  # Almost all products have "Да" (Yes) availability
-                                'regular_price': regular_price,
-                                'discounted_price': discount_price,
-                                'discount_percent': discount_percent,
-                                'discount_type': discount_type,
-                                'discount_period': discount_period,
-                                'category': derive_category_from_name(product_name),
-                                'market': market,
-                                'last_updated': update_date or datetime.now().strftime('%Y-%m-%d')
-                            })
-        
-        # Convert to DataFrame
-        if products:
-            df = pd.DataFrame(products)
-            # Convert price to float
-            df['price'] = pd.to_numeric(df['price'], errors='coerce')
-            # Filter out invalid prices
-            df = df[df['price'].notna()]
-            return df
+                if not columns:
+                    print("Could not find the KAM table header, falling back to text extraction")
+        
+        if workers > 1 and page_count > 1:
+            # Split the pages into a few chunks per worker so that slow pages
+            # don't leave the other processes idle at the end
+            chunk_count = min(page_count, workers * 4)
+            bounds = [page_count * i // chunk_count for i in range(chunk_count + 1)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_extract_kam_page_range, pdf_path, bounds[i], bounds[i + 1], columns)
+                    for i in range(chunk_count)
+                ]
+                # Collect in submission order to keep the rows in page order
+                pages = [page for future in futures for page in future.result()]
         else:
-            return pd.DataFrame()
+            pages = _extract_kam_page_range(pdf_path, 0, page_count, columns)
+        
+        return _build_kam_dataframe(pages)
     
     except Exception as e:
         print(f"Error extracting data from KAM PDF: {e}")
         return pd.DataFrame()
 
+def _build_kam_dataframe(pages):
+    """Combine per-page (update_date, products) results into the KAM DataFrame."""
+    # The update date is printed on the first page; apply it to every row
+    update_date = next((page_date for page_date, _ in pages if page_date), None)
+    last_updated = update_date or datetime.now().strftime('%Y-%m-%d')
+    
+    products = []
+    for _, page_products in pages:
+        for product in page_products:
+            products.append({**product, 'last_updated': last_updated})
+    
+    # Convert to DataFrame
+    if products:
+        df = pd.DataFrame(products)
+        # Convert price to float
+        df['price'] = pd.to_numeric(df['price'], errors='coerce')
+        # Filter out invalid prices
+        df = df[df['price'].notna()]
+        return df
+    else:
+        return pd.DataFrame()
+
+def _extract_kam_page_range(pdf_path, start, stop, columns=None):
+    """
+    Parse pages [start, stop) of a KAM price list.
+    
+    Runs in a worker process when extraction is parallel, so it opens the PDF
+    itself and returns plain picklable data. Pages are read as tables when
+    the columns from detect_kam_columns are given, and as text otherwise.
+    
+    Returns:
+    --------
+    list of tuple
+        One (update_date, products) tuple per page, in page order
+    """
+    pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[start:stop]:
+            if columns:
+                pages.append(_parse_kam_page_table(page, columns))
+            else:
+                pages.append(_parse_kam_page(page))
+    return pages
+
+def _parse_kam_page(page):
+    """Parse a pdfplumber page into an (update_date, products) tuple."""
+    page_text = page.extract_text()
+    # Release the cached layout objects of the page
+    page.close()
+    
+    if not page_text:
+        return None, []
+    
+    return parse_kam_update_date(page_text), parse_kam_page_text(page_text)
+
+def detect_kam_columns(page):
+    """
+    Detect the column boundaries of the KAM table from its header row.
+    
+    Parameters:
+    -----------
+    page : pdfplumber.page.Page
+        Page containing the table header
+        
+    Returns:
+    --------
+    list of tuple or None
+        (x_start, field) pairs sorted by x_start, or None if the page has no
+        table header
+    """
+    columns = {}
+    for word in page.extract_words():
+        field = KAM_TABLE_HEADERS.get(word['text'])
+        if field and field not in columns:
+            columns[field] = word['x0'] - KAM_COLUMN_PADDING
+    
+    # The name and price columns are needed to find the rows
+    if 'name' not in columns or 'price' not in columns:
+        return None
+    
+    return sorted((x_start, field) for field, x_start in columns.items())
+
+def _parse_kam_page_table(page, columns):
+    """
+    Parse a pdfplumber page into an (update_date, products) tuple using the table columns.
+    
+    Characters are assigned to a column by their horizontal center and to a
+    row by the price that starts it, so no layout text extraction is needed.
+    """
+    starts = [x_start for x_start, _ in columns]
+    fields = [field for _, field in columns]
+    price_column = fields.index('price')
+    
+    chars = page.chars
+    # Release the cached layout objects of the page
+    page.close()
+    
+    if not chars:
+        return None, []
+    
+    # The update date is the first line of the page
+    first_top = min(char['top'] for char in chars)
+    date_chars = [char for char in chars if char['top'] - first_top <= KAM_ROW_TOLERANCE]
+    update_date = parse_kam_update_date(_chars_to_text(date_chars))
+    
+    column_chars = [[] for _ in columns]
+    for char in chars:
+        column = bisect.bisect_right(starts, (char['x0'] + char['x1']) / 2) - 1
+        if column >= 0:
+            column_chars[column].append(char)
+    
+    # Every product row starts at the line of its price
+    row_tops = [
+        top - KAM_ROW_TOLERANCE
+        for top, text in _group_chars_into_lines(column_chars[price_column])
+        if PRICE_PATTERN.fullmatch(text)
+    ]
+    
+    cells = [[[] for _ in columns] for _ in row_tops]
+    for column, column_char_list in enumerate(column_chars):
+        for char in column_char_list:
+            row = bisect.bisect_right(row_tops, char['top']) - 1
+            # Characters above the first row belong to the page header
+            if row >= 0:
+                cells[row][column].append(char)
+    
+    products = []
+    for row_cells in cells:
+        row = {field: _chars_to_text(cell_chars) or None for field, cell_chars in zip(fields, row_cells)}
+        product = _kam_table_row_to_product(row)
+        if product:
+            products.append(product)
+    
+    return update_date, products
+
+def _kam_table_row_to_product(row):
+    """Convert the cell texts of one table row into a product dict."""
+    price_match = PRICE_PATTERN.search(row.get('price') or '')
+    product_name = row.get('name')
+    if not price_match or not product_name:
+        return None
+    
+    unit_price = row.get('unit_price')
+    if unit_price:
+        # The currency wraps onto its own line in the unit price cell
+        unit_price = re.sub(r'\s*ден\.$', '', unit_price) or None
+    
+    regular_price_match = PRICE_PATTERN.search(row.get('regular_price') or '')
+    
+    # The discount cell holds both the discounted price and the percentage
+    discount_cell = row.get('discounted_price') or ''
+    discount_price_match = PRICE_PATTERN.search(discount_cell)
+    discount_percent_match = re.search(r'Попуст:\s*(\d+)%', discount_cell)
+    
+    return {
+        'name': product_name,
+        'price': _price_digits(price_match),
+        'unit_price': unit_price,
+        'description': row.get('description'),
+        'availability': row.get('availability'),
+        'regular_price': _price_digits(regular_price_match),
+        'discounted_price': _price_digits(discount_price_match),
+        'discount_percent': discount_percent_match.group(1) if discount_percent_match else None,
+        'discount_type': row.get('discount_type'),
+        'discount_period': row.get('discount_period'),
+        'category': derive_category_from_name(product_name),
+        'market': "KAM"
+    }
+
+def _price_digits(price_match):
+    """Return the price of a PRICE_PATTERN match without thousands separators."""
+    if not price_match:
+        return None
+    return price_match.group(1).replace('.', '')
+
+def _group_chars_into_lines(chars):
+    """Group characters into (top, text) lines, top to bottom."""
+    lines = []
+    line_chars = []
+    line_top = None
+    for char in sorted(chars, key=lambda char: char['top']):
+        if line_top is not None and char['top'] - line_top > KAM_ROW_TOLERANCE:
+            lines.append((line_top, _line_text(line_chars)))
+            line_chars = []
+            line_top = None
+        if line_top is None:
+            line_top = char['top']
+        line_chars.append(char)
+    if line_chars:
+        lines.append((line_top, _line_text(line_chars)))
+    return lines
+
+def _line_text(chars):
+    """Join the characters of one line left to right, collapsing whitespace."""
+    return ' '.join(''.join(char['text'] for char in sorted(chars, key=lambda char: char['x0'])).split())
+
+def _chars_to_text(chars):
+    """Join the characters of a cell into text, one space between lines."""
+    return ' '.join(text for _, text in _group_chars_into_lines(chars) if text)
+
+def parse_kam_update_date(page_text):
+    """
+    Extract the price update date from the text of a KAM page.
+    
+    Returns:
+    --------
+    str or None
+        Date formatted as YYYY-MM-DD, or None if the page has no date header
+    """
+    date_match = re.search(r'Датум и време на последно ажурирање на цените: (\d{2}\.\d{2}\.\d{4})', page_text)
+    if not date_match:
+        return None
+    
+    date_str = date_match.group(1)
+    try:
+        return datetime.strptime(date_str, '%d.%m.%Y').strftime('%Y-%m-%d')
+    except:
+        return datetime.now().strftime('%Y-%m-%d')
+
+def parse_kam_page_text(page_text):
+    """
+    Parse the product rows out of the text of a single KAM page.
+    
+    Parameters:
+    -----------
+    page_text : str
+        Text of the page as returned by pdfplumber
+        
+    Returns:
+    --------
+    list of dict
+        Products found on the page, without the last_updated field
+    """
+    # Market name is KAM
+    market = "KAM"
+    products = []
+    
+    # Split into lines
+    lines = page_text.split('\n')
+    
+    # Skip header lines
+    product_lines = []
+    for i, line in enumerate(lines):
+        if 'Назив на' in line and 'Продажна' in line:
+            # Skip header rows (there are usually 7 rows in the header)
+            product_lines = lines[i+7:]
+            break
+    
+    # Process the product lines
+    for line in product_lines:
+        # Skip empty lines and header repetitions
+        if not line.strip() or 'Назив на' in line or 'Датум и време' in line:
+            continue
+        
+        product = parse_kam_line(line)
+        if product:
+            product['market'] = market
+            products.append(product)
+    
+    return products
+
+def parse_kam_line(line):
+    """
+    Parse a single KAM product line with one search of KAM_LINE_PATTERN.
+    
+    Example: "ЛАЈБИЦИ СЛИБО 23ден. 100 гр = 9.2 ЛАЈБИЦИ ДИЕТ Да 23ден."
+    
+    Parameters:
+    -----------
+    line : str
+        Line of page text
+        
+    Returns:
+    --------
+    dict or None
+        Product fields without market and last_updated, or None if the line
+        has no price
+    """
+    match = KAM_LINE_PATTERN.search(line)
+    if not match:
+        return None
+    
+    # Product name is everything before the price
+    product_name = line[:match.start()].strip()
+    description = match.group('description')
+    if description is not None:
+        description = description.strip()
+    
+    return {
+        'name': product_name,
+        'price': match.group('price'),
+        'unit_price': match.group('unit_price'),
+        'description': description,
+        'availability': "Да",  # Almost all products have "Да" (Yes) availability
+        'regular_price': match.group('regular_price'),
+        'discounted_price': match.group('discounted_price'),
+        'discount_percent': match.group('discount_percent'),
+        'discount_type': None,
+        'discount_period': None,
+        'category': derive_category_from_name(product_name)
+    }
+
+def iter_kam_rows(pdf_path):
+    """
+    Stream product rows from a KAM price list one page at a time.
+    
+    Unlike extract_kam_prices_from_pdf, no list of all products or DataFrame
+    is built, so memory stays bounded by a single page regardless of the size
+    of the document.
+    
+    Parameters:
+    -----------
+    pdf_path : str
+        Path to the PDF file
+        
+    Yields:
+    -------
+    dict
+        Product rows with the same fields as the columns of
+        extract_kam_prices_from_pdf, with the price converted to a number
+    """
+    update_date = None
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            page_date, products = _parse_kam_page(page)
+            
+            # The update date is printed on the first page
+            if update_date is None and page_date:
+                update_date = page_date
+            last_updated = update_date or datetime.now().strftime('%Y-%m-%d')
+            
+            for product in products:
+                try:
+                    product['price'] = int(product['price'])
+                except (TypeError, ValueError):
+                    # Same as the DataFrame path, which drops invalid prices
+                    continue
+                product['last_updated'] = last_updated
+                yield product
+
+def write_kam_rows(rows, output_path, chunk_size=1000):
+    """
+    Write product rows to a CSV or Parquet file in fixed-size chunks.
+    
+    Parameters:
+    -----------
+    rows : iterable of dict
+        Product rows, e.g. from iter_kam_rows
+    output_path : str
+        Destination file; a .parquet extension writes Parquet (requires
+        pyarrow), anything else writes CSV
+    chunk_size : int, optional
+        Number of rows buffered in memory before they are written (default: 1000)
+        
+    Returns:
+    --------
+    int
+        Number of rows written
+    """
+    if output_path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        # Declare the schema up front; a chunk where a column is all None
+        # would otherwise be inferred as a different type
+        schema = pa.schema([
+            (column, pa.int64() if column == 'price' else pa.string())
+            for column in KAM_COLUMNS
+        ])
+        with pq.ParquetWriter(output_path, schema) as writer:
+            return _write_chunks(
+                rows, chunk_size,
+                lambda chunk: writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            )
+    
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        header = [True]
+        
+        def write_chunk(chunk):
+            chunk.to_csv(f, index=False, header=header[0])
+            header[0] = False
+        
+        count = _write_chunks(rows, chunk_size, write_chunk)
+        # Write the header even when there are no rows
+        if header[0]:
+            pd.DataFrame(columns=KAM_COLUMNS).to_csv(f, index=False)
+        return count
+
+def _write_chunks(rows, chunk_size, write_chunk):
+    """Group rows into DataFrames of chunk_size rows and pass them to write_chunk."""
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            write_chunk(pd.DataFrame(chunk, columns=KAM_COLUMNS))
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        write_chunk(pd.DataFrame(chunk, columns=KAM_COLUMNS))
+        count += len(chunk)
+    return count
+
+def extract_kam_prices_incremental(pdf_path, state_path=KAM_PAGE_STATE_PATH):
+    """
+    Extract a KAM price list, re-parsing only the pages that changed since the last run.
+    
+    Every page is fingerprinted from its raw content stream, which is much
+    cheaper than text extraction. Pages whose fingerprint was seen in the
+    previous version of the list reuse the stored rows; only new or changed
+    pages go through extract_text and the line parsing. The fingerprints and
+    parsed rows are saved to state_path for the next run.
+    
+    Parameters:
+    -----------
+    pdf_path : str
+        Path to the PDF file
+    state_path : str, optional
+        JSON file holding the page fingerprints and rows of the previous run
+        
+    Returns:
+    --------
+    tuple
+        (pandas.DataFrame, list of int) - the extracted products, same as
+        extract_kam_prices_from_pdf, and the 1-based numbers of the pages
+        that were re-parsed
+    """
+    try:
+        previous_pages = []
+        if state_path and os.path.exists(state_path):
+            try:
+                with open(state_path, encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('version') == KAM_EXTRACTOR_VERSION:
+                    previous_pages = state['pages']
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error reading KAM page state, re-parsing all pages: {e}")
+        
+        # Pages may shift when products are added, so look them up by fingerprint
+        previous_by_fingerprint = {page['fingerprint']: page for page in previous_pages}
+        
+        pages = []
+        page_state = []
+        changed_pages = []
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_number, page in enumerate(pdf.pages, start=1):
+                fingerprint = fingerprint_kam_page(page)
+                previous = previous_by_fingerprint.get(fingerprint)
+                
+                if previous is not None:
+                    update_date, products = previous['update_date'], previous['products']
+                    # The date header is left out of the fingerprint, so read the
+                    # current date from the first page instead of reusing the old one
+                    if page_number == 1:
+                        update_date = parse_kam_update_date(page.extract_text() or '')
+                        page.close()
+                else:
+                    update_date, products = _parse_kam_page(page)
+                    changed_pages.append(page_number)
+                
+                pages.append((update_date, products))
+                page_state.append({
+                    'fingerprint': fingerprint,
+                    'update_date': update_date,
+                    'products': products
+                })
+        
+        df = _build_kam_dataframe(pages)
+        
+        if state_path:
+            state_dir = os.path.dirname(state_path)
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+            with open(state_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': KAM_EXTRACTOR_VERSION, 'pages': page_state}, f, ensure_ascii=False)
+        
+        return df, changed_pages
+    
+    except Exception as e:
+        print(f"Error extracting data from KAM PDF: {e}")
+        return pd.DataFrame(), []
+
+def fingerprint_kam_page(page, header_band=KAM_HEADER_BAND):
+    """
+    Compute a fingerprint of a KAM page from its raw content stream.
+    
+    The update date is printed at the top of every page, so text objects
+    positioned within header_band points of the top edge are left out;
+    otherwise every page would change with each daily republish.
+    
+    Parameters:
+    -----------
+    page : pdfplumber.page.Page
+        Page to fingerprint
+    header_band : float, optional
+        Height in points of the page header excluded from the fingerprint
+        
+    Returns:
+    --------
+    str
+        Hex digest of the page content
+    """
+    contents = page.page_obj.contents or []
+    if not isinstance(contents, list):
+        contents = [contents]
+    data = b''.join(resolve1(stream).get_data() for stream in contents)
+    
+    digest = hashlib.sha256()
+    position = 0
+    for match in TEXT_OBJECT_PATTERN.finditer(data):
+        tm_match = TEXT_MATRIX_PATTERN.search(match.group(0))
+        if tm_match:
+            y = float(tm_match.group(1))
+            # Generators either flip the origin to the top edge (negative y) or keep it at the bottom
+            if -header_band <= y <= 0 or page.height - header_band <= y <= page.height:
+                digest.update(data[position:match.start()])
+                position = match.end()
+    digest.update(data[position:])
+    return digest.hexdigest()
+
 def derive_category_from_name(product_name):
     """
     Infer product category from its name based on common keywords.
@@ -179,40 +702,39 @@ def derive_category_from_name(product_name):
     str
         Inferred category
     """
-    # Define category keywords
-    category_keywords = {
-        'Хлеб и пекарски производи': ['леб', 'кифл', 'пекар', 'тост', 'брускет', 'пченкар'],
-        'Слатки и бонбони': ['чокол', 'бонбон', 'желе', 'торт', 'крем', 'слатк', 'какао'],
-        'Житарки и мусли': ['житарк', 'мусли', 'корнфлекс'],
-        'Тестенини': ['фиде', 'тестен'],
-        'Месо и месни производи': ['месо', 'колбас', 'салам', 'пршут', 'сувомес'],
-        'Млеко и млечни производи': ['млеко', 'јогурт', 'сирењ', 'кашкав', 'павлак'],
-        'Овошје и зеленчук': ['овошј', 'зеленчук', 'јаболк', 'домат', 'пипер'],
-        'Пијалоци': ['пијалок', 'сок', 'вода', 'кафе', 'чај'],
-        'Производи за домаќинство': ['средство', 'чист', 'детерг', 'перал', 'сапун', 'шампон'],
-        'Храна за миленици': ['храна за', 'миленич']
-    }
-    
-    # Check each category
-    product_lower = product_name.lower()
-    for category, keywords in category_keywords.items():
-        for keyword in keywords:
-            if keyword.lower() in product_lower:
-                return category
+    return classify_name(product_name, KAM_CATEGORY_CLASSIFIER, default="Останато")
+
+def derive_categories_from_names(product_names):
+    """
+    Infer the categories of a whole column of product names in one call.
     
-    # Default category
-    return "Останато"
+    Parameters:
+    -----------
+    product_names : pandas.Series or list
+        Names of the products
+        
+    Returns:
+    --------
+    pandas.Series
+        Inferred categories, same as derive_category_from_name for each name
+    """
+    return classify_names(product_names, KAM_CATEGORY_CLASSIFIER, default="Останато")
 
-def kam_pdf_to_csv(pdf_path, csv_path):
+def kam_pdf_to_csv(pdf_path, csv_path, workers=1):
     """
     Convert KAM PDF price list to CSV file.
     
+    With a single worker the rows are streamed to disk page by page, so the
+    whole price list is never held in memory.
+    
     Parameters:
     -----------
     pdf_path : str
         Path to the PDF file
     csv_path : str
         Path where to save the CSV file
+    workers : int, optional
+        Number of worker processes, see extract_kam_prices_from_pdf
         
     Returns:
     --------
@@ -220,11 +742,21 @@ def kam_pdf_to_csv(pdf_path, csv_path):
         True if conversion was successful, False otherwise
     """
     try:
-        df = extract_kam_prices_from_pdf(pdf_path)
+        if workers == 1:
+            # Stream into a temporary file next to the CSV and only replace
+            # the CSV once rows were extracted, so a bad PDF or an error
+            # partway through leaves an existing CSV untouched
+            return write_atomic(
+                csv_path,
+                lambda tmp_path: write_kam_rows(iter_kam_rows(pdf_path), tmp_path) > 0,
+                suffix=os.path.splitext(csv_path)[1]
+            )
+        
+        df = extract_kam_prices_from_pdf(pdf_path, workers=workers)
         if not df.empty:
             df.to_csv(csv_path, index=False, encoding='utf-8-sig')
             return True
         return False
     except Exception as e:
         print(f"Error converting KAM PDF to CSV: {e}")
-        return False
\ No newline at end of file
+        return False
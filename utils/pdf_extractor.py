@@ -2,6 +2,44 @@ import pdfplumber
 import pandas as pd
 import re
 import os
+import bisect
+from utils.category_classifier import compile_category_keywords, classify_name
+
+# Bump when the parsing logic changes so cached extractions are invalidated
+EXTRACTOR_VERSION = "2"
+
+# Patterns for product entries: product name followed by a price like $XX.XX.
+# They are combined into one alternation, tried in this order at every
+# position of a single scan. Group names are prefixed with the pattern name,
+# which is reported as the pattern that matched.
+PRODUCT_PATTERN = re.compile(
+    # Name followed by $XX.XX or $ XX.XX
+    r'(?P<dollar_price>(?P<dollar_price_name>[A-Za-z0-9][\w\s,&\-\'\.]+)\$\s*(?P<dollar_price_price>[\d]+\.[\d]{2}))'
+    # Name with price then $
+    r'|(?P<price_dollar>(?P<price_dollar_name>[A-Za-z0-9][\w\s,&\-\'\.]+)[\s]*(?P<price_dollar_price>[\d]+\.[\d]{2})\s*\$)'
+    # Name with spaces then $ XX
+    r'|(?P<dollar_whole>(?P<dollar_whole_name>[A-Za-z0-9][\w\s,&\-\'\.]+)[\s]*\$\s*(?P<dollar_whole_price>[\d]+))'
+)
+
+# Common categories and keywords associated with them
+PRODUCT_CATEGORIES = {
+    'Electronics': ['tv', 'television', 'phone', 'smartphone', 'laptop', 'computer', 'tablet', 'camera', 'headphone'],
+    'Groceries': ['bread', 'milk', 'cheese', 'yogurt', 'egg', 'cereal', 'rice', 'pasta', 'flour', 'sugar', 'oil'],
+    'Produce': ['apple', 'banana', 'orange', 'grape', 'strawberry', 'vegetable', 'tomato', 'potato', 'onion', 'carrot'],
+    'Meat & Seafood': ['beef', 'chicken', 'pork', 'fish', 'salmon', 'shrimp', 'meat', 'seafood', 'steak', 'ground'],
+    'Dairy': ['milk', 'cheese', 'yogurt', 'butter', 'cream', 'ice cream'],
+    'Bakery': ['bread', 'cake', 'cookie', 'pastry', 'muffin', 'bagel'],
+    'Beverages': ['water', 'soda', 'juice', 'coffee', 'tea', 'drink', 'beer', 'wine', 'alcohol'],
+    'Household': ['cleaner', 'detergent', 'soap', 'paper towel', 'toilet paper', 'trash bag'],
+    'Personal Care': ['shampoo', 'conditioner', 'toothpaste', 'soap', 'deodorant', 'razor', 'lotion'],
+    'Clothing': ['shirt', 'pant', 'dress', 'sock', 'underwear', 'jacket', 'sweater', 'shoe'],
+    'Home & Garden': ['furniture', 'decor', 'plant', 'garden', 'tool', 'bedding', 'curtain'],
+    'Baby': ['diaper', 'formula', 'baby food', 'wipe', 'baby'],
+    'Pet': ['pet food', 'dog', 'cat', 'pet', 'litter'],
+    'Toys & Games': ['toy', 'game', 'puzzle', 'doll', 'action figure'],
+    'Sports & Outdoors': ['sport', 'outdoor', 'exercise', 'fitness', 'camping', 'hiking']
+}
+PRODUCT_CATEGORY_CLASSIFIER = compile_category_keywords(PRODUCT_CATEGORIES)
 
 def extract_prices_from_pdf(pdf_path):
     """
@@ -34,15 +72,19 @@ def extract_prices_from_pdf(pdf_path):
             if not market:
                 market = extract_market_from_content(full_text)
             
+            # Index the lines once for the category lookups of all products;
+            # the product scan records the lines each product was found on
+            line_index = build_line_index(full_text)
+            
             # Extract products information from text
-            extracted_products = extract_products_from_text(full_text)
+            extracted_products = extract_products_from_text(full_text, line_index)
             
             # Add market information to each product
             for product in extracted_products:
                 product['market'] = market
                 # Attempt to extract category if not already present
                 if 'category' not in product or not product['category']:
-                    product['category'] = extract_category(product['name'], full_text)
+                    product['category'] = extract_category(product['name'], full_text, line_index)
                 products.append(product)
         
         # Create DataFrame from extracted products
@@ -103,7 +145,7 @@ def extract_market_from_content(text):
     # Default to "Unknown Market" if no match found
     return "Unknown Market"
 
-def extract_products_from_text(text):
+def extract_products_from_text(text, line_index=None):
     """
     Extract product information from text using various patterns.
     
@@ -111,43 +153,48 @@ def extract_products_from_text(text):
     - Product name
     - Price
     - Category (if available)
+    
+    All patterns are combined into PRODUCT_PATTERN and the text is scanned
+    once, so every product is emitted once instead of once per matching
+    pattern. The name of the pattern that matched is kept in match_pattern.
+    
+    When a line_index from build_line_index is passed, the lines each
+    product name was found on are recorded in it, so extract_category can
+    look them up instead of searching the text for every product.
     """
     products = []
+    seen = set()
     
-    # Pattern for product entries: product name followed by price
-    # This pattern looks for product descriptions followed by price patterns like $XX.XX
-    patterns = [
-        r'([A-Za-z0-9][\w\s,&\-\'\.]+)\$([\d]+\.[\d]{2})',  # Name followed by $XX.XX
-        r'([A-Za-z0-9][\w\s,&\-\'\.]+)[\s]*\$([\d]+\.[\d]{2})',  # Name with spaces then $XX.XX
-        r'([A-Za-z0-9][\w\s,&\-\'\.]+)[\s]*\$\s*([\d]+\.[\d]{2})',  # Name with spaces then $ XX.XX
-        r'([A-Za-z0-9][\w\s,&\-\'\.]+)[\s]*([\d]+\.[\d]{2})\s*\$',  # Name with price then $
-        r'([A-Za-z0-9][\w\s,&\-\'\.]+)[\s]*\$\s*([\d]+)',  # Name with spaces then $ XX
-    ]
-    
-    # Try each pattern
-    for pattern in patterns:
-        matches = re.findall(pattern, text)
-        for match in matches:
-            name = match[0].strip()
-            price = match[1].strip()
+    for match in PRODUCT_PATTERN.finditer(text):
+        pattern_name = match.lastgroup
+        raw_name = match.group(f'{pattern_name}_name')
+        name = raw_name.strip()
+        price = match.group(f'{pattern_name}_price').strip()
+        
+        # Skip if name is too short (likely a false match)
+        if len(name) < 3:
+            continue
             
-            # Skip if name is too short (likely a false match)
-            if len(name) < 3:
-                continue
-                
-            # Skip if price is unreasonable
-            try:
-                price_float = float(price)
-                if price_float <= 0 or price_float > 10000:
-                    continue
-            except ValueError:
+        # Skip if price is unreasonable
+        try:
+            price_float = float(price)
+            if price_float <= 0 or price_float > 10000:
                 continue
-            
-            # Add product to list
-            products.append({
-                'name': name,
-                'price': price,
-            })
+        except ValueError:
+            continue
+        
+        if line_index is not None:
+            # Line of the first character of the stripped name
+            start = match.start(f'{pattern_name}_name') + len(raw_name) - len(raw_name.lstrip())
+            _add_name_line(line_index, name, bisect.bisect_right(line_index['line_starts'], start) - 1)
+        
+        # Add product to list
+        seen.add((name, price))
+        products.append({
+            'name': name,
+            'price': price,
+            'match_pattern': pattern_name
+        })
     
     # Try to find structured tables
     lines = text.split('\n')
@@ -170,61 +217,151 @@ def extract_products_from_text(text):
                 
                 if price and name_parts:
                     name = ' '.join(name_parts)
+                    # Skip rows the pattern scan already found
+                    if (name, price) in seen:
+                        continue
+                    seen.add((name, price))
+                    if line_index is not None:
+                        _add_name_line(line_index, name, i)
                     products.append({
                         'name': name,
                         'price': price,
+                        'match_pattern': 'table'
                     })
     
     return products
 
-def extract_category(product_name, text):
-    """Attempt to extract product category based on product name or surrounding text."""
-    # Common categories and keywords associated with them
-    categories = {
-        'Electronics': ['tv', 'television', 'phone', 'smartphone', 'laptop', 'computer', 'tablet', 'camera', 'headphone'],
-        'Groceries': ['bread', 'milk', 'cheese', 'yogurt', 'egg', 'cereal', 'rice', 'pasta', 'flour', 'sugar', 'oil'],
-        'Produce': ['apple', 'banana', 'orange', 'grape', 'strawberry', 'vegetable', 'tomato', 'potato', 'onion', 'carrot'],
-        'Meat & Seafood': ['beef', 'chicken', 'pork', 'fish', 'salmon', 'shrimp', 'meat', 'seafood', 'steak', 'ground'],
-        'Dairy': ['milk', 'cheese', 'yogurt', 'butter', 'cream', 'ice cream'],
-        'Bakery': ['bread', 'cake', 'cookie', 'pastry', 'muffin', 'bagel'],
-        'Beverages': ['water', 'soda', 'juice', 'coffee', 'tea', 'drink', 'beer', 'wine', 'alcohol'],
-        'Household': ['cleaner', 'detergent', 'soap', 'paper towel', 'toilet paper', 'trash bag'],
-        'Personal Care': ['shampoo', 'conditioner', 'toothpaste', 'soap', 'deodorant', 'razor', 'lotion'],
-        'Clothing': ['shirt', 'pant', 'dress', 'sock', 'underwear', 'jacket', 'sweater', 'shoe'],
-        'Home & Garden': ['furniture', 'decor', 'plant', 'garden', 'tool', 'bedding', 'curtain'],
-        'Baby': ['diaper', 'formula', 'baby food', 'wipe', 'baby'],
-        'Pet': ['pet food', 'dog', 'cat', 'pet', 'litter'],
-        'Toys & Games': ['toy', 'game', 'puzzle', 'doll', 'action figure'],
-        'Sports & Outdoors': ['sport', 'outdoor', 'exercise', 'fitness', 'camping', 'hiking']
-    }
-    
-    # Convert product name to lowercase for matching
-    product_lower = product_name.lower()
+def _add_name_line(line_index, name, i):
+    """Record that the product name was found on line i, keeping the lines in order."""
+    name_lines = line_index['name_lines'].setdefault(name, [])
+    position = bisect.bisect_left(name_lines, i)
+    if position == len(name_lines) or name_lines[position] != i:
+        name_lines.insert(position, i)
+
+def extract_category(product_name, text, line_index=None):
+    """
+    Attempt to extract product category based on product name or surrounding text.
     
+    Parameters:
+    -----------
+    product_name : str
+        Name of the product
+    text : str
+        Full text of the document
+    line_index : dict, optional
+        Index of the document from build_line_index. Pass the same index for
+        every product of a document so the text is only split and scanned once.
+        
+    Returns:
+    --------
+    str
+        Product category
+    """
     # Check if any category keywords appear in the product name
-    for category, keywords in categories.items():
-        for keyword in keywords:
-            if keyword.lower() in product_lower:
-                return category
+    category = classify_name(product_name, PRODUCT_CATEGORY_CLASSIFIER)
+    if category:
+        return category
+    
+    if line_index is None:
+        line_index = build_line_index(text)
+    
+    # Products found by several patterns are looked up repeatedly
+    name_categories = line_index['name_categories']
+    if product_name not in name_categories:
+        name_categories[product_name] = _category_from_context(product_name, line_index)
     
-    # If no match found, look for the product name in the text and check surrounding lines
+    return name_categories[product_name]
+
+def build_line_index(text):
+    """
+    Index the lines of a document for category lookups by extract_category.
+    
+    The line offsets are computed once, and the category context around a
+    line is computed the first time a product is found on it and then reused.
+    Passed to extract_products_from_text, the index also maps every product
+    name to the lines it was found on.
+    
+    Parameters:
+    -----------
+    text : str
+        Full text of the document
+        
+    Returns:
+    --------
+    dict
+        Line index to pass to extract_category
+    """
     lines = text.split('\n')
-    for i, line in enumerate(lines):
-        if product_name in line:
-            # Check 3 lines before and after for category headers
-            context_lines = lines[max(0, i-3):min(len(lines), i+4)]
-            context_text = ' '.join(context_lines).lower()
-            
-            for category, keywords in categories.items():
-                for keyword in keywords:
-                    if keyword.lower() in context_text:
-                        return category
-            
-            # Look for category headers (usually short lines, all caps)
-            for line in context_lines:
-                if line.isupper() and 3 < len(line) < 30 and line.strip() != product_name:
-                    # This might be a category header
-                    return line.strip()
+    line_starts = []
+    offset = 0
+    for line in lines:
+        line_starts.append(offset)
+        offset += len(line) + 1
+    
+    return {
+        'text': text,
+        'lines': lines,
+        'line_starts': line_starts,
+        'contexts': {},
+        'name_categories': {},
+        'name_lines': {}
+    }
+
+def _category_from_context(product_name, line_index):
+    """Find the category around the lines containing the product name."""
+    # A line never contains a newline, so such names can't be found
+    if not product_name or '\n' in product_name:
+        return "Uncategorized"
+    
+    # Visit the lines containing the product name in order
+    for i in _lines_containing(product_name, line_index):
+        keyword_category, headers = _line_context(line_index, i)
+        if keyword_category:
+            return keyword_category
+        for header in headers:
+            if header != product_name:
+                # This might be a category header
+                return header
     
     # Default to "Uncategorized" if no match found
-    return "Uncategorized"
\ No newline at end of file
+    return "Uncategorized"
+
+def _lines_containing(product_name, line_index):
+    """Return the lines the product name was found on, in order."""
+    name_lines = line_index['name_lines']
+    if product_name in name_lines:
+        return name_lines[product_name]
+    
+    # Names extract_products_from_text did not record are searched for once
+    text = line_index['text']
+    lines = line_index['lines']
+    line_starts = line_index['line_starts']
+    found = []
+    position = text.find(product_name)
+    while position != -1:
+        i = bisect.bisect_right(line_starts, position) - 1
+        found.append(i)
+        # Continue after the end of this line
+        if i + 1 >= len(lines):
+            break
+        position = text.find(product_name, line_starts[i + 1])
+    
+    name_lines[product_name] = found
+    return found
+
+def _line_context(line_index, i):
+    """Return the keyword category and candidate headers within 3 lines of line i."""
+    contexts = line_index['contexts']
+    if i not in contexts:
+        lines = line_index['lines']
+        # Check 3 lines before and after for category headers
+        context_lines = lines[max(0, i-3):min(len(lines), i+4)]
+        context_text = ' '.join(context_lines)
+        
+        keyword_category = classify_name(context_text, PRODUCT_CATEGORY_CLASSIFIER)
+        
+        # Category headers are usually short lines, all caps
+        headers = [line.strip() for line in context_lines if line.isupper() and 3 < len(line) < 30]
+        contexts[i] = (keyword_category, headers)
+    
+    return contexts[i]
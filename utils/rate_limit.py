@@ -0,0 +1,95 @@
+import time
+import random
+import threading
+
+class TokenBucket:
+    """
+    Token bucket limiting the request rate to one host.
+
+    Holds up to burst tokens, refilled at rate tokens per second. Each request
+    takes one token and waits when the bucket is empty. Safe to share between
+    threads.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """
+    Return a jittered exponential backoff delay before a retry.
+
+    Uses "full jitter": a random delay between 0 and base_delay * 2**attempt,
+    capped at max_delay, so clients retrying together spread out.
+
+    Parameters:
+    -----------
+    attempt : int
+        Number of the failed attempt, starting at 0
+    base_delay : float, optional
+        Delay ceiling of the first retry in seconds
+    max_delay : float, optional
+        Largest delay in seconds
+
+    Returns:
+    --------
+    float
+        Seconds to wait
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def call_with_retries(func, *args, retries=3, base_delay=1.0, max_delay=60.0, retry_if=None, **kwargs):
+    """
+    Call a function, retrying with jittered exponential backoff when it raises.
+
+    Parameters:
+    -----------
+    func : callable
+        Function to call with the remaining arguments
+    retries : int, optional
+        Retries after the first attempt
+    base_delay : float, optional
+        Delay ceiling of the first retry in seconds
+    max_delay : float, optional
+        Largest delay in seconds
+    retry_if : callable, optional
+        Called with the exception, returns whether it is worth retrying
+        (default: retry every exception)
+
+    Returns:
+    --------
+    object
+        Return value of func
+
+    Raises:
+    -------
+    Exception
+        The exception of the last attempt when all attempts fail
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or (retry_if and not retry_if(e)):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f"Attempt {attempt + 1} of {func.__name__} failed: {e}; retrying in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,102 @@
+import pandas as pd
+from utils.web_scraper import VERO_URL, STOKOMAK_URL, parse_vero_prices, parse_stokomak_prices
+
+# Columns of every retailer's products, in the order of the products table
+RETAILER_COLUMNS = [
+    'name', 'price', 'unit_price', 'category', 'market', 'description',
+    'availability', 'regular_price', 'discounted_price', 'discount_percent',
+    'discount_type', 'discount_period', 'last_updated', 'source_document'
+]
+
+# Registered retailers: the pages of their price lists and the function
+# parsing the HTML of one page into a DataFrame, called as parse(html, url)
+RETAILERS = {}
+
+def register_retailer(name, urls, parse):
+    """
+    Add a retailer to the registry, or replace an already registered one.
+
+    Parameters:
+    -----------
+    name : str
+        Market name of the retailer
+    urls : list of str
+        Pages of the retailer's price list
+    parse : callable
+        Function parsing the HTML of one page, called as parse(html, url)
+
+    Returns:
+    --------
+    dict
+        The registry entry
+    """
+    RETAILERS[name] = {
+        'urls': list(urls),
+        'parse': parse
+    }
+    return RETAILERS[name]
+
+def parse_retailer_page(name, html, url, retailers=None):
+    """
+    Parse one page of a retailer's price list into the shared retailer schema.
+
+    Parameters:
+    -----------
+    name : str
+        Name of a registered retailer
+    html : str
+        HTML content of the page
+    url : str
+        Address of the page
+    retailers : dict, optional
+        Registry to look the retailer up in (default: RETAILERS)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Products with exactly the RETAILER_COLUMNS columns
+    """
+    retailer = (retailers or RETAILERS)[name]
+    return to_retailer_schema(retailer['parse'](html, url), name, url)
+
+def to_retailer_schema(df, market, url=None):
+    """
+    Conform a parser's products to RETAILER_COLUMNS.
+
+    Missing columns are added: market and source_document from the arguments,
+    regular_price from price, availability as 'Yes' and the rest as None.
+    Columns outside the schema are dropped.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        Products returned by a retailer parser
+    market : str
+        Market name used when the parser does not set one
+    url : str, optional
+        Address of the parsed page, used as the source document
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Products with exactly the RETAILER_COLUMNS columns
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=RETAILER_COLUMNS)
+
+    defaults = {
+        'market': market,
+        'availability': 'Yes',
+        'source_document': url
+    }
+    df = df.copy()
+    for column in RETAILER_COLUMNS:
+        if column not in df.columns:
+            if column == 'regular_price' and 'price' in df.columns:
+                df[column] = df['price']
+            else:
+                df[column] = defaults.get(column)
+    return df[RETAILER_COLUMNS]
+
+register_retailer('Vero', [VERO_URL], parse_vero_prices)
+register_retailer('Stokomak', [STOKOMAK_URL], parse_stokomak_prices)
@@ -0,0 +1,86 @@
+import time
+import asyncio
+import requests
+import pandas as pd
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from utils.http_cache import fetch_page
+from utils.retailers import RETAILERS, parse_retailer_page
+
+# Maximum number of simultaneous requests to one host
+DEFAULT_PER_HOST_LIMIT = 4
+
+DEFAULT_TIMEOUT = 30
+
+def scrape_all_retailers(retailers=None, per_host_limit=DEFAULT_PER_HOST_LIMIT, timeout=DEFAULT_TIMEOUT):
+    """
+    Scrape every configured retailer concurrently.
+
+    All price-list pages of all retailers are fetched at the same time, so a
+    full scrape takes about as long as the slowest site instead of the sum
+    of all of them.
+
+    Parameters:
+    -----------
+    retailers : dict, optional
+        Retailer registry like RETAILERS (default: RETAILERS)
+    per_host_limit : int, optional
+        Maximum number of simultaneous requests to one host
+    timeout : float, optional
+        Timeout of a single request in seconds
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Products of all retailers combined, in the RETAILER_COLUMNS schema
+    """
+    return asyncio.run(scrape_all_retailers_async(retailers, per_host_limit, timeout))
+
+async def scrape_all_retailers_async(retailers=None, per_host_limit=DEFAULT_PER_HOST_LIMIT, timeout=DEFAULT_TIMEOUT):
+    """
+    Coroutine version of scrape_all_retailers, for callers with a running event loop.
+    """
+    retailers = retailers or RETAILERS
+    sessions = {}
+    semaphores = {}
+
+    async def scrape_page(name, url):
+        host = urlsplit(url).netloc
+        if host not in sessions:
+            sessions[host] = _create_session(per_host_limit)
+            semaphores[host] = asyncio.Semaphore(per_host_limit)
+
+        start = time.perf_counter()
+        try:
+            async with semaphores[host]:
+                # requests is blocking, so the request runs in a worker thread
+                html = await asyncio.to_thread(fetch_page, url, sessions[host], timeout=timeout)
+            df = parse_retailer_page(name, html, url, retailers)
+            print(f"Scraped {len(df)} products from {name} ({url}) in {time.perf_counter() - start:.2f}s")
+            return df
+        except Exception as e:
+            print(f"Error scraping {name} ({url}): {e}")
+            return pd.DataFrame()
+
+    try:
+        frames = await asyncio.gather(*[
+            scrape_page(name, url)
+            for name, retailer in retailers.items()
+            for url in retailer['urls']
+        ])
+    finally:
+        for session in sessions.values():
+            session.close()
+
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def _create_session(pool_size):
+    """Create a session keeping up to pool_size connections to a host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
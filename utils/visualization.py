@@ -54,7 +54,7 @@ def create_price_comparison_chart(data):
     
     return fig
 
-def create_market_comparison_chart(data):
+def create_market_comparison_chart(data, stats=None):
     """
     Create a visualization comparing markets based on product prices.
     
@@ -62,21 +62,28 @@ def create_market_comparison_chart(data):
     -----------
     data : pandas.DataFrame
         DataFrame containing product data for multiple markets
+    stats : pandas.DataFrame, optional
+        Precomputed aggregates with market, mean_price and product_count
+        columns, used instead of grouping data
         
     Returns:
     --------
     plotly.graph_objects.Figure
         Interactive market comparison chart
     """
-    # Calculate average price by market
-    avg_prices = data.groupby('market')['price'].mean().reset_index()
-    avg_prices = avg_prices.sort_values('price')
-    
-    # Calculate product count by market
-    product_counts = data.groupby('market').size().reset_index(name='count')
-    
-    # Merge data
-    market_data = pd.merge(avg_prices, product_counts, on='market')
+    if stats is not None:
+        market_data = stats.rename(columns={'mean_price': 'price', 'product_count': 'count'})
+        market_data = market_data[['market', 'price', 'count']].sort_values('price')
+    else:
+        # Calculate average price by market
+        avg_prices = data.groupby('market')['price'].mean().reset_index()
+        avg_prices = avg_prices.sort_values('price')
+        
+        # Calculate product count by market
+        product_counts = data.groupby('market').size().reset_index(name='count')
+        
+        # Merge data
+        market_data = pd.merge(avg_prices, product_counts, on='market')
     
     # Create the figure
     fig = px.bar(
@@ -158,7 +165,7 @@ def create_price_distribution_chart(data, category=None):
     
     return fig
 
-def create_category_comparison_chart(data):
+def create_category_comparison_chart(data, stats=None):
     """
     Create a chart comparing average prices across product categories.
     
@@ -166,12 +173,18 @@ def create_category_comparison_chart(data):
     -----------
     data : pandas.DataFrame
         DataFrame containing product data with categories
+    stats : pandas.DataFrame, optional
+        Precomputed aggregates with category, mean_price and product_count
+        columns, used instead of grouping data
         
     Returns:
     --------
     plotly.graph_objects.Figure
         Interactive category comparison chart
     """
+    if stats is not None:
+        data = stats.rename(columns={'mean_price': 'price', 'product_count': 'count'})
+    
     # Ensure category column exists
     if 'category' not in data.columns:
         # Create a dummy chart with a message
@@ -185,14 +198,17 @@ def create_category_comparison_chart(data):
         )
         return fig
     
-    # Calculate average price by category
-    avg_prices = data.groupby('category')['price'].mean().reset_index()
-    
-    # Calculate product count by category
-    product_counts = data.groupby('category').size().reset_index(name='count')
-    
-    # Merge data
-    category_data = pd.merge(avg_prices, product_counts, on='category')
+    if stats is not None:
+        category_data = data[['category', 'price', 'count']]
+    else:
+        # Calculate average price by category
+        avg_prices = data.groupby('category')['price'].mean().reset_index()
+        
+        # Calculate product count by category
+        product_counts = data.groupby('category').size().reset_index(name='count')
+        
+        # Merge data
+        category_data = pd.merge(avg_prices, product_counts, on='category')
     
     # Sort by average price
     category_data = category_data.sort_values('price', ascending=False)
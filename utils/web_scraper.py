@@ -1,10 +1,20 @@
 import pandas as pd
 import trafilatura
-import requests
 from bs4 import BeautifulSoup
 import re
 import json
 from datetime import datetime
+from utils.http_cache import fetch_page
+
+try:
+    import lxml.etree
+    import lxml.html
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+VERO_URL = "https://pricelist.vero.com.mk/91_2.html"
+STOKOMAK_URL = "https://stokomak.com.mk/proverka-na-ceni/"
 
 def scrape_vero_prices():
     """
@@ -15,69 +25,141 @@ def scrape_vero_prices():
     pandas.DataFrame
         DataFrame containing product information (name, price, category)
     """
-    url = "https://pricelist.vero.com.mk/91_2.html"
+    url = VERO_URL
 
     try:
-        # Send a request to the website
-        response = requests.get(url)
-        response.raise_for_status()
+        # Send a request to the website, reusing the cached page if unchanged
+        html = fetch_page(url)
+
+        return parse_vero_prices(html, url)
+
+    except Exception as e:
+        print(f"Error scraping Vero prices: {e}")
+        return pd.DataFrame()
 
-        # Parse the HTML content with BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
+def parse_vero_prices(html, url=VERO_URL, parser=None):
+    """
+    Parse product prices from a page of Vero's price list
+
+    Parameters:
+    -----------
+    html : str
+        HTML content of the price list page
+    url : str, optional
+        Address of the page, stored as the source document
+    parser : str, optional
+        'lxml' or 'html.parser' (default: HTML_PARSER, lxml when installed)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        DataFrame containing product information (name, price, category)
+    """
+    try:
+        parser = parser or HTML_PARSER
+        if parser == 'lxml':
+            rows = _iter_vero_rows_lxml(html)
+        elif parser == 'html.parser':
+            rows = _iter_vero_rows_bs4(html)
+        else:
+            raise ValueError(f"Unknown HTML parser: {parser}")
 
         products = []
         market_name = "Vero"
-
-        # Find all table rows
-        rows = soup.find_all('tr')
+        last_updated = datetime.now().strftime('%Y-%m-%d')
         current_category = "General"
 
-        for row in rows:
-            # Look for category headers (typically in th elements)
-            th = row.find('th')
-            if th and th.text.strip():
-                current_category = th.text.strip()
+        for header, name, price_text in rows:
+            if header:
+                current_category = header
                 continue
 
-            # Extract product information from td elements
-            cells = row.find_all('td')
-            if len(cells) >= 2:
-                name = cells[0].text.strip()
-                price_text = cells[-1].text.strip()
+            # Clean up price text and convert to float
+            price_clean = re.sub(r'[^\d.,]', '', price_text)
+            price_clean = price_clean.replace(',', '.')
 
-                # Clean up price text and convert to float
-                price_clean = re.sub(r'[^\d.,]', '', price_text)
-                price_clean = price_clean.replace(',', '.')
-
-                try:
-                    price = float(price_clean)
-                    # Only add products with valid prices and within reasonable range
-                    if 0 < price < 1000000:  # Limit to prices under 1 million
-                        products.append({
-                            'name': name,
-                            'price': price,
-                            'unit_price': None,  # Vero doesn't provide unit prices
-                            'category': current_category,
-                            'market': market_name,
-                            'description': None,
-                            'availability': 'Yes',
-                            'regular_price': price,
-                            'discounted_price': None,
-                            'discount_percent': None,
-                            'discount_type': None,
-                            'discount_period': None,
-                            'last_updated': datetime.now().strftime('%Y-%m-%d'),
-                            'source_document': url
-                        })
-                except ValueError:
-                    continue
+            try:
+                price = float(price_clean)
+                # Only add products with valid prices and within reasonable range
+                if 0 < price < 1000000:  # Limit to prices under 1 million
+                    products.append({
+                        'name': name,
+                        'price': price,
+                        'unit_price': None,  # Vero doesn't provide unit prices
+                        'category': current_category,
+                        'market': market_name,
+                        'description': None,
+                        'availability': 'Yes',
+                        'regular_price': price,
+                        'discounted_price': None,
+                        'discount_percent': None,
+                        'discount_type': None,
+                        'discount_period': None,
+                        'last_updated': last_updated,
+                        'source_document': url
+                    })
+            except ValueError:
+                continue
 
         return pd.DataFrame(products)
 
     except Exception as e:
-        print(f"Error scraping Vero prices: {e}")
+        print(f"Error parsing Vero prices: {e}")
         return pd.DataFrame()
 
+def _iter_vero_rows_bs4(html):
+    """
+    Yield the table rows of a Vero page parsed with BeautifulSoup.
+
+    A category header row yields (header, None, None), a product row
+    (None, name, price_text). Rows with neither are skipped.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    for row in soup.find_all('tr'):
+        # Look for category headers (typically in th elements)
+        th = row.find('th')
+        if th and th.text.strip():
+            yield th.text.strip(), None, None
+            continue
+
+        # Extract product information from td elements
+        cells = row.find_all('td')
+        if len(cells) >= 2:
+            yield None, cells[0].text.strip(), cells[-1].text.strip()
+
+def _iter_vero_rows_lxml(html):
+    """
+    Same as _iter_vero_rows_bs4, with the tree built and walked by lxml's C parser.
+
+    Gives the same rows on well-formed pages. On broken markup such as unclosed
+    rows lxml repairs the tree the way a browser does, where html.parser nests
+    the rows into each other.
+    """
+    # lxml refuses to parse an empty document, which simply has no rows
+    if not html or not html.strip():
+        return
+
+    # lxml rejects str input with an XML encoding declaration; the text is
+    # already decoded, so hand it over as UTF-8 and ignore declared charsets
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    root = lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding='utf-8'))
+    # BeautifulSoup leaves script and style contents out of the text, so do the same
+    lxml.etree.strip_elements(root, 'script', 'style', with_tail=False)
+
+    for row in root.iter('tr'):
+        th = next(row.iter('th'), None)
+        if th is not None:
+            header = th.text_content().strip()
+            if header:
+                yield header, None, None
+                continue
+
+        cells = list(row.iter('td'))
+        if len(cells) >= 2:
+            yield None, cells[0].text_content().strip(), cells[-1].text_content().strip()
+
 def scrape_stokomak_prices():
     """
     Scrape product prices from stokomak.com.mk/proverka-na-ceni/
@@ -87,14 +169,31 @@ def scrape_stokomak_prices():
     pandas.DataFrame
         DataFrame containing product information (name, price, category)
     """
-    url = "https://stokomak.com.mk/proverka-na-ceni/"
+    url = STOKOMAK_URL
+
+    # Send a request to the website, reusing the cached page if unchanged
+    html = fetch_page(url)  # Raises an exception for HTTP errors
+
+    return parse_stokomak_prices(html, url)
+
+def parse_stokomak_prices(html, url=STOKOMAK_URL):
+    """
+    Parse product prices from the Stokomak price check page
 
-    # Send a request to the website
-    response = requests.get(url)
-    response.raise_for_status()  # Raise an exception for HTTP errors
+    Parameters:
+    -----------
+    html : str
+        HTML content of the price check page
+    url : str, optional
+        Address of the page
 
+    Returns:
+    --------
+    pandas.DataFrame
+        DataFrame containing product information (name, price, category)
+    """
     # Parse the HTML content with BeautifulSoup
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = BeautifulSoup(html, 'html.parser')
 
     # Find the table with product prices
     tables = soup.find_all('table', class_='table')
@@ -172,9 +271,8 @@ def scrape_stokomak_prices():
 
     # Final fallback: use trafilatura to extract text content
     if not products:
-        # Extract text content
-        downloaded = trafilatura.fetch_url(url)
-        text = trafilatura.extract(downloaded)
+        # Extract text content from the page that was already downloaded
+        text = trafilatura.extract(html)
 
         if text:
             # Look for price patterns in the text